@@ -11,6 +11,7 @@ PATH = [
     [f"./rotation_slerp_t_{i:0.2f}.png" for i in (0.0, 0.25, 0.5, 0.75, 1.0)],
     ["./depth_test_disabled.png", "./depth_test_enabled.png"],
     ["./thin_triangles_aliasing.png", "./thin_triangles_antialiasing.png"],
+    ["./shadow_map.png"],
 ]
 
 
@@ -1,18 +1,44 @@
 """
 核心模块
+
+子模块在首次访问对应名称时才导入（PEP 562），
+只用到 Rasterization 的脚本不必加载服务、缓存等其他模块。
 """
 
-from .math_utils import LookAt, Ortho, Perspective, Quaternion
-from .geometry import Triangle, create_jagged_triangle, create_thin_triangles
-from .rasterizer import Rasterization
-
-__all__ = [
-    "LookAt",
-    "Ortho",
-    "Perspective",
-    "Quaternion",
-    "Triangle",
-    "create_jagged_triangle",
-    "create_thin_triangles",
-    "Rasterization",
-]
+import importlib
+
+# 名称 -> 所在子模块
+_EXPORTS = {
+    "LookAt": ".math_utils",
+    "Ortho": ".math_utils",
+    "Perspective": ".math_utils",
+    "Quaternion": ".math_utils",
+    "Triangle": ".geometry",
+    "create_jagged_triangle": ".geometry",
+    "create_thin_triangles": ".geometry",
+    "Rasterization": ".rasterizer",
+    "ShadowMap": ".shadow",
+    "Scene": ".scene",
+    "SkinnedMesh": ".skinning",
+    "BVH": ".raytracer",
+    "RayCaster": ".raytracer",
+    "RenderCache": ".cache",
+    "ImageSink": ".image_io",
+    "RenderServer": ".service",
+    "RenderClient": ".service",
+    "make_request": ".service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value  # 之后的访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,166 @@
+"""
+渲染结果缓存模块
+以场景内容的哈希为键缓存渲染好的帧缓冲，内存中按 LRU 淘汰，可选落盘
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+def render_key(renderer, vertices: np.ndarray, colors: np.ndarray) -> str:
+    """
+    计算一次渲染的内容哈希
+
+    覆盖三角形数组、视图/投影矩阵、分辨率以及所有影响输出的渲染设置，
+    任意一项不同都会得到不同的键。
+    """
+    h = hashlib.blake2b(digest_size=20)
+
+    def update(*values):
+        for value in values:
+            if isinstance(value, np.ndarray):
+                value = np.ascontiguousarray(value, dtype=np.float64)
+                h.update(str(value.shape).encode())
+                h.update(value.tobytes())
+            else:
+                h.update(repr(value).encode())
+            h.update(b"|")
+
+    update(
+        vertices,
+        colors,
+        np.asarray(renderer.view_m),
+        np.asarray(renderer.proj_m),
+        renderer.width,
+        renderer.height,
+        renderer.enable_antialiasing,
+        tuple(renderer.sample_points),
+        renderer.enable_depth_test,
+        renderer.depth_only,
+        renderer.enable_draw_order,
+        renderer.enable_z_prepass,
+        renderer.micro_triangle_area,
+        renderer.tile_size,
+        renderer.render_backend,
+    )
+
+    # 阴影贴图的内容同样影响输出
+    shadow_map = renderer.shadow_map
+    if shadow_map is not None:
+        update(
+            renderer.shadow_strength,
+            shadow_map.bias,
+            shadow_map.pcf_radius,
+            np.asarray(shadow_map.rasterizer.view_m),
+            np.asarray(shadow_map.rasterizer.proj_m),
+            shadow_map.depth,
+        )
+
+    return h.hexdigest()
+
+
+class RenderCache:
+    """渲染结果缓存"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, disk_dir=None):
+        """
+        Args:
+            max_bytes: 内存中缓存的帧缓冲总字节数上限
+            disk_dir: 落盘目录；给出时，从内存淘汰的结果写入磁盘，未命中内存时再从磁盘读取
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()  # key -> (color_buf, depth_buf)
+        self.current_bytes = 0
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or (
+            self.disk_dir is not None and os.path.exists(self._disk_path(key))
+        )
+
+    def stats(self) -> dict:
+        """命中/未命中等计数"""
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
+
+    def get(self, key):
+        """
+        查询缓存
+
+        Returns:
+            (color_buf, depth_buf) 的副本，未命中时返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy(), entry[1].copy()
+
+        if self.disk_dir is not None and os.path.exists(self._disk_path(key)):
+            with np.load(self._disk_path(key)) as data:
+                entry = data["color"], data["depth"]
+            self.disk_hits += 1
+            self._insert(key, entry)
+            return entry[0].copy(), entry[1].copy()
+
+        self.misses += 1
+        return None
+
+    def put(self, key, color_buf: np.ndarray, depth_buf: np.ndarray):
+        """保存一帧渲染结果"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._insert(key, (color_buf.copy(), depth_buf.copy()))
+
+    def clear(self):
+        """清空内存中的缓存（磁盘上的文件保留）"""
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def _insert(self, key, entry):
+        size = entry[0].nbytes + entry[1].nbytes
+        if size > self.max_bytes:
+            # 单帧就超过预算，只落盘
+            self._spill(key, entry)
+            return
+
+        self._entries[key] = entry
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self.current_bytes -= old_entry[0].nbytes + old_entry[1].nbytes
+            self.evictions += 1
+            self._spill(old_key, old_entry)
+
+    def _spill(self, key, entry):
+        """把结果写入磁盘"""
+        if self.disk_dir is None or os.path.exists(self._disk_path(key)):
+            return
+        # 先写临时文件再改名，避免并发读取到写了一半的文件
+        tmp_path = self._disk_path(key) + ".tmp.npz"
+        np.savez(tmp_path, color=entry[0], depth=entry[1])
+        os.replace(tmp_path, self._disk_path(key))
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.npz")
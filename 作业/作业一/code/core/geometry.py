@@ -112,11 +112,58 @@ class Triangle:
 
     def interpolate_depth(self, barycentric: np.ndarray) -> np.ndarray:
         """使用重心坐标插值深度"""
-        return barycentric.dot(self.vertices[:, 2])
+        # 显式写出加权和而不用 dot：结果不随 BLAS 实现变化，与 core.kernels 逐位一致
+        a, b, c = barycentric
+        z = self.vertices[:, 2]
+        return a * z[0] + b * z[1] + c * z[2]
 
     def interpolate_color(self, barycentric: np.ndarray) -> np.ndarray:
         """使用重心坐标插值颜色"""
-        return barycentric.dot(self.colors)
+        a, b, c = barycentric
+        return a * self.colors[0] + b * self.colors[1] + c * self.colors[2]
+
+
+def stack_triangles(t_list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    把三角形列表堆叠成数组，便于批量处理
+
+    返回:
+        vertices: (N, 3, 3) 顶点坐标
+        colors: (N, 3, 3) 顶点颜色
+    """
+    t_list = list(t_list)
+    if not t_list:
+        return np.zeros((0, 3, 3)), np.zeros((0, 3, 3))
+    vertices = np.array([t.vertices for t in t_list], dtype=np.float64)
+    colors = np.array([t.colors for t in t_list], dtype=np.float64)
+    return vertices, colors
+
+
+def iter_triangle_chunks(t_iterable, chunk_size=4096):
+    """
+    把三角形的可迭代对象按块转换为数组，供 Rasterization.render_stream 使用
+
+    每次只持有一个块的三角形，适合配合生成器使用。
+    """
+    chunk = []
+    for t in t_iterable:
+        chunk.append(t)
+        if len(chunk) == chunk_size:
+            yield stack_triangles(chunk)
+            chunk = []
+    if chunk:
+        yield stack_triangles(chunk)
+
+
+def iter_array_chunks(vertices, colors=None, chunk_size=65536):
+    """
+    把 (N, 3, 3) 顶点/颜色数组切成块，供 Rasterization.render_stream 使用
+
+    切片不复制数据，数组为 np.memmap 时每次只有一个块被读入内存。
+    """
+    for start in range(0, len(vertices), chunk_size):
+        stop = start + chunk_size
+        yield vertices[start:stop], None if colors is None else colors[start:stop]
 
 
 # 几何体创建辅助函数
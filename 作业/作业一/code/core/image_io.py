@@ -0,0 +1,128 @@
+"""
+图像输出模块
+按扩展名选择格式写出帧缓冲，并提供在后台线程中编码的异步输出
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def to_uint8(color_buf: np.ndarray) -> np.ndarray:
+    """把 [0, 1] 的浮点颜色缓冲转换为 8 位图像"""
+    return (np.clip(color_buf, 0, 1) * 255).astype("uint8")
+
+
+def write_image(color_buf: np.ndarray, filename, compress_level=6) -> None:
+    """
+    按扩展名写出颜色缓冲
+
+    Args:
+        color_buf: (H, W, 3) 颜色缓冲，取值 [0, 1]
+        filename: 输出路径，扩展名决定格式：
+                  .png 压缩图像；.ppm / .bmp 不压缩；.npy 原样保存浮点缓冲；
+                  其他扩展名交给 PIL 处理
+        compress_level: PNG 的 zlib 压缩级别，0 不压缩最快，9 最小
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".npy":
+        np.save(filename, color_buf)
+        return
+
+    image = to_uint8(color_buf)
+    if ext == ".ppm":
+        # 二进制 PPM（P6）只有一行文本头，直接写出像素
+        height, width = image.shape[:2]
+        with open(filename, "wb") as f:
+            f.write(f"P6\n{width} {height}\n255\n".encode("ascii"))
+            f.write(np.ascontiguousarray(image).tobytes())
+    else:
+        from PIL import Image
+
+        if ext == ".png":
+            Image.fromarray(image).save(filename, compress_level=compress_level)
+        else:
+            # .bmp 以及 PIL 支持的其他格式
+            Image.fromarray(image).save(filename)
+
+
+class ImageSink:
+    """
+    异步图像输出
+
+    submit 复制一份帧缓冲后立即返回，编码和写文件在后台线程中进行，
+    渲染循环不必等待 zlib 压缩。待写出的帧数达到上限时 submit 会阻塞，
+    避免渲染快于编码时副本无限堆积。
+    """
+
+    def __init__(self, workers=2, max_pending=8, compress_level=6):
+        """
+        Args:
+            workers: 编码线程数
+            max_pending: 同时等待写出的帧数上限
+            compress_level: PNG 的 zlib 压缩级别
+        """
+        self.compress_level = compress_level
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="image-sink")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, color_buf: np.ndarray, filename, compress_level=None):
+        """
+        提交一帧
+
+        Args:
+            color_buf: 颜色缓冲，调用返回后即可被覆盖
+            filename: 输出路径，格式见 write_image
+            compress_level: 覆盖默认的 PNG 压缩级别
+        """
+        if compress_level is None:
+            compress_level = self.compress_level
+        self._slots.acquire()
+        try:
+            future = self._pool.submit(
+                write_image, color_buf.copy(), filename, compress_level
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def save(self, renderer, filename, compress_level=None):
+        """提交渲染器当前的颜色缓冲"""
+        return self.submit(renderer.color_buf, filename, compress_level)
+
+    def flush(self):
+        """等待所有已提交的帧写完；有帧写出失败时抛出第一个异常"""
+        with self._lock:
+            futures = list(self._futures)
+            self._futures.clear()
+        errors = [e for e in (f.exception() for f in futures) if e is not None]
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        """写完所有帧并关闭线程池"""
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _done(self, future):
+        self._slots.release()
+        # 写出成功的帧不再需要记录，只保留失败的帧供 flush 抛出异常
+        if not future.cancelled() and future.exception() is None:
+            with self._lock:
+                self._futures.discard(future)
@@ -0,0 +1,240 @@
+"""
+光栅化内核模块
+把逐像素的遍历、MSAA 采样和深度比较抽成签名固定的内核，提供两种实现:
+    numba: 安装了 Numba 时，以 nopython / parallel 模式编译并缓存到磁盘
+    numpy: 对每个三角形的包围盒一次性向量化计算，无需额外依赖
+
+两种实现与 Rasterization 原有的逐像素循环按相同的顺序做相同的浮点运算，
+输出逐像素一致。
+
+内核签名:
+    raster_triangle(vertices, colors, min_x, max_x, min_y, max_y,
+                    color_buf, depth_buf, depth_test, depth_equal,
+                    write_color, record_depth)
+    raster_msaa(vertices, colors, min_x, max_x, min_y, max_y,
+                sample_points, color_buf, depth_buf, record_depth)
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+Kernels = namedtuple("Kernels", ["name", "raster_triangle", "raster_msaa"])
+
+# 没有 Numba 时循环内核仍可作为普通 Python 函数运行（很慢，只用于对照）
+prange = numba.prange if NUMBA_AVAILABLE else range
+
+
+def _loop_raster_triangle(
+    vertices,
+    colors,
+    min_x,
+    max_x,
+    min_y,
+    max_y,
+    color_buf,
+    depth_buf,
+    depth_test,
+    depth_equal,
+    write_color,
+    record_depth,
+):
+    """逐像素循环版本，编译后按行并行"""
+    xA, yA, zA = vertices[0, 0], vertices[0, 1], vertices[0, 2]
+    xB, yB, zB = vertices[1, 0], vertices[1, 1], vertices[1, 2]
+    xC, yC, zC = vertices[2, 0], vertices[2, 1], vertices[2, 2]
+    S = (xB - xA) * (yC - yA) - (xC - xA) * (yB - yA)
+
+    # 同一个三角形内每个像素只写一次，行之间没有依赖
+    for y in prange(min_y, max_y + 1):
+        py = y + 0.5
+        for x in range(min_x, max_x + 1):
+            px = x + 0.5
+            c = ((xA - px) * (yB - py) - (xB - px) * (yA - py)) / S
+            a = ((xB - px) * (yC - py) - (xC - px) * (yB - py)) / S
+            b = ((xC - px) * (yA - py) - (xA - px) * (yC - py)) / S
+            if not (a >= 0 and b >= 0 and c >= 0):
+                continue
+
+            depth = a * zA + b * zB + c * zC
+            if depth_equal:
+                shade = depth == depth_buf[y, x]
+            elif depth_test:
+                shade = depth <= depth_buf[y, x]
+                if shade:
+                    depth_buf[y, x] = depth
+            else:
+                shade = True
+                if record_depth:
+                    depth_buf[y, x] = depth
+
+            if shade and write_color:
+                for k in range(3):
+                    color_buf[y, x, k] = (
+                        a * colors[0, k] + b * colors[1, k] + c * colors[2, k]
+                    )
+
+
+def _loop_raster_msaa(
+    vertices,
+    colors,
+    min_x,
+    max_x,
+    min_y,
+    max_y,
+    sample_points,
+    color_buf,
+    depth_buf,
+    record_depth,
+):
+    """MSAA 的逐像素循环版本，编译后按行并行"""
+    xA, yA, zA = vertices[0, 0], vertices[0, 1], vertices[0, 2]
+    xB, yB, zB = vertices[1, 0], vertices[1, 1], vertices[1, 2]
+    xC, yC, zC = vertices[2, 0], vertices[2, 1], vertices[2, 2]
+    S = (xB - xA) * (yC - yA) - (xC - xA) * (yB - yA)
+    n = sample_points.shape[0]
+
+    for y in prange(min_y, max_y + 1):
+        for x in range(min_x, max_x + 1):
+            r = 0.0
+            g = 0.0
+            bl = 0.0
+            for s in range(n):
+                px = x + sample_points[s, 0] + 0.5
+                py = y + sample_points[s, 1] + 0.5
+                c = ((xA - px) * (yB - py) - (xB - px) * (yA - py)) / S
+                a = ((xB - px) * (yC - py) - (xC - px) * (yB - py)) / S
+                b = ((xC - px) * (yA - py) - (xA - px) * (yC - py)) / S
+                if a >= 0 and b >= 0 and c >= 0:
+                    r += a * colors[0, 0] + b * colors[1, 0] + c * colors[2, 0]
+                    g += a * colors[0, 1] + b * colors[1, 1] + c * colors[2, 1]
+                    bl += a * colors[0, 2] + b * colors[1, 2] + c * colors[2, 2]
+                    if record_depth:
+                        depth_buf[y, x] = a * zA + b * zB + c * zC
+            color_buf[y, x, 0] = r / n
+            color_buf[y, x, 1] = g / n
+            color_buf[y, x, 2] = bl / n
+
+
+def _barycentric_grid(vertices, xs, ys):
+    """包围盒内所有采样点的重心坐标，运算顺序与 Triangle.compute_barycentric 一致"""
+    (xA, yA, _), (xB, yB, _), (xC, yC, _) = vertices
+    S = (xB - xA) * (yC - yA) - (xC - xA) * (yB - yA)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = ((xA - xs) * (yB - ys) - (xB - xs) * (yA - ys)) / S
+        a = ((xB - xs) * (yC - ys) - (xC - xs) * (yB - ys)) / S
+        b = ((xC - xs) * (yA - ys) - (xA - xs) * (yC - ys)) / S
+    return a, b, c
+
+
+def _interpolate(a, b, c, values):
+    """按重心坐标插值，values 为 (3,) 或 (3, 3)"""
+    if values.ndim == 1:
+        return a * values[0] + b * values[1] + c * values[2]
+    return a[:, None] * values[0] + b[:, None] * values[1] + c[:, None] * values[2]
+
+
+def numpy_raster_triangle(
+    vertices,
+    colors,
+    min_x,
+    max_x,
+    min_y,
+    max_y,
+    color_buf,
+    depth_buf,
+    depth_test,
+    depth_equal,
+    write_color,
+    record_depth,
+):
+    """向量化版本：整个包围盒一次计算"""
+    if min_x > max_x or min_y > max_y:
+        return
+
+    ys, xs = np.mgrid[min_y : max_y + 1, min_x : max_x + 1] + 0.5
+    a, b, c = _barycentric_grid(vertices, xs, ys)
+    inside = (a >= 0) & (b >= 0) & (c >= 0)
+    py, px = np.nonzero(inside)
+    a, b, c = a[py, px], b[py, px], c[py, px]
+    py += min_y
+    px += min_x
+
+    depth = _interpolate(a, b, c, vertices[:, 2])
+    if depth_equal:
+        shade = depth == depth_buf[py, px]
+    elif depth_test:
+        shade = depth <= depth_buf[py, px]
+        depth_buf[py[shade], px[shade]] = depth[shade]
+    else:
+        shade = slice(None)
+        if record_depth:
+            depth_buf[py, px] = depth
+
+    if write_color:
+        color_buf[py[shade], px[shade]] = _interpolate(
+            a[shade], b[shade], c[shade], colors
+        )
+
+
+def numpy_raster_msaa(
+    vertices,
+    colors,
+    min_x,
+    max_x,
+    min_y,
+    max_y,
+    sample_points,
+    color_buf,
+    depth_buf,
+    record_depth,
+):
+    """MSAA 的向量化版本：按采样点循环，每次计算整个包围盒"""
+    if min_x > max_x or min_y > max_y:
+        return
+
+    ys, xs = np.mgrid[min_y : max_y + 1, min_x : max_x + 1]
+    xs, ys = xs.ravel(), ys.ravel()
+    color_sum = np.zeros((len(xs), 3))
+    for dx, dy in sample_points:
+        a, b, c = _barycentric_grid(vertices, xs + dx + 0.5, ys + dy + 0.5)
+        inside = np.flatnonzero((a >= 0) & (b >= 0) & (c >= 0))
+        a, b, c = a[inside], b[inside], c[inside]
+        color_sum[inside] += _interpolate(a, b, c, colors)
+        if record_depth:
+            depth_buf[ys[inside], xs[inside]] = _interpolate(a, b, c, vertices[:, 2])
+    color_buf[ys, xs] = color_sum / len(sample_points)
+
+
+_kernels = {
+    "numpy": Kernels("numpy", numpy_raster_triangle, numpy_raster_msaa),
+}
+
+
+def get_kernels(backend="auto") -> Kernels:
+    """
+    获取一组内核
+
+    Args:
+        backend: "numba"、"numpy"，或 "auto"（安装了 Numba 时用 numba，否则用 numpy）
+    """
+    if backend == "auto":
+        backend = "numba" if NUMBA_AVAILABLE else "numpy"
+    if backend == "numba" and "numba" not in _kernels:
+        if not NUMBA_AVAILABLE:
+            raise ImportError("numba 内核需要安装 numba：pip install numba")
+        # 首次编译较慢，cache=True 把结果缓存到 __pycache__，之后的进程直接加载
+        jit = numba.njit(parallel=True, cache=True, error_model="numpy")
+        _kernels["numba"] = Kernels(
+            "numba", jit(_loop_raster_triangle), jit(_loop_raster_msaa)
+        )
+    if backend not in _kernels:
+        raise ValueError(f"未知的内核后端: {backend}")
+    return _kernels[backend]
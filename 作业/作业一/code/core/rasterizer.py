@@ -4,9 +4,14 @@
 """
 
 import numpy as np
-from PIL import Image
 
-from .geometry import Triangle
+from .cache import render_key
+from .geometry import Triangle, stack_triangles
+from .image_io import write_image
+
+# 微小三角形 splat 路径：每个三角形测试的候选像素边长，以及每批三角形的数量
+MICRO_SPAN = 4
+MICRO_BATCH_SIZE = 4096
 
 
 class Rasterization:
@@ -21,12 +26,25 @@ class Rasterization:
         self.proj_m = np.eye(4)
         self.enable_antialiasing = False
         self.enable_depth_test = False
+        self.depth_only = False
+        self.enable_draw_order = False
+        self.enable_z_prepass = False
+        self.micro_triangle_area = 0.0
+        self.tile_size = 0
+        self.render_backend = "raster"
+        self.kernel_backend = "python"
+        self._kernels = None
+        self._raycaster = None
+        self.cache = None
+        self._depth_equal = False  # Z-prepass 的着色 pass 中，深度测试改为“相等”
         self.sample_points = [(0.0, 0.0)]
+        self.shadow_map = None
+        self.shadow_strength = 0.6
 
     def clear_buffers(self):
-        """清除缓冲区"""
-        self.color_buf = np.zeros((self.height, self.width, 3))
-        self.depth_buf = np.ones((self.height, self.width)) * np.finfo(np.float32).max
+        """原地清除缓冲区，反复渲染时不重新分配"""
+        self.color_buf.fill(0.0)
+        self.depth_buf.fill(np.finfo(np.float32).max)
 
     def setViewM(self, mat):
         self.view_m = mat
@@ -51,6 +69,115 @@ class Rasterization:
         """启用/禁用深度测试"""
         self.enable_depth_test = enable
 
+    def enableDepthOnly(self, enable=True):
+        """
+        启用/禁用仅深度模式
+
+        仅深度模式下不插值、不写入颜色，只更新深度缓冲，
+        用于阴影贴图等只需要深度的渲染。
+        """
+        self.depth_only = enable
+
+    def enableDrawOrder(self, enable=True):
+        """
+        启用/禁用绘制顺序优化
+
+        开启深度测试时，按三角形最近顶点的深度从前往后绘制，
+        被遮挡的片元在深度测试中提前被拒绝，不再插值颜色。
+        关闭深度测试时绘制顺序决定结果，因此不会重排。
+        """
+        self.enable_draw_order = enable
+
+    def enableZPrepass(self, enable=True):
+        """
+        启用/禁用 Z-prepass
+
+        开启深度测试时，先用仅深度模式写出最终深度，
+        再只对深度与缓冲中相等的片元着色，每个像素只着色一次。
+        """
+        self.enable_z_prepass = enable
+
+    def enableMicroTriangles(self, enable=True, area_threshold=1.0):
+        """
+        启用/禁用微小三角形的 splat 快速路径
+
+        Args:
+            enable: 是否启用
+            area_threshold: 屏幕空间面积（像素）小于该值的三角形走 splat 路径
+        """
+        self.micro_triangle_area = area_threshold if enable else 0.0
+
+    def enableTiledRasterization(self, enable=True, tile_size=8):
+        """
+        启用/禁用分层（粗/细两级）光栅化
+
+        粗层把包围盒划分为 tile_size x tile_size 的块（一般取 8 或 16），
+        在块角点处计算边函数，把块分为完全在外、完全覆盖和部分覆盖三类；
+        完全覆盖的块直接用平面方程整块填充，只有部分覆盖的块逐像素测试。
+
+        Args:
+            enable: 是否启用
+            tile_size: 块的边长（像素）
+        """
+        self.tile_size = max(1, int(tile_size)) if enable else 0
+
+    def setRenderBackend(self, backend="raster"):
+        """
+        选择渲染后端
+
+        Args:
+            backend: "raster" 为光栅化；"raycast" 为基于 BVH 的光线投射，
+                     结果写回同一套颜色/深度缓冲，便于与光栅化结果对比
+
+        两个后端的覆盖、深度一致，颜色都按屏幕空间的重心坐标插值（与光栅化器相同，
+        透视投影下并非透视校正），差别只在浮点舍入。
+        光线投射总是取最近的交点，相当于开启深度测试，且每个像素只有一个采样点，
+        因此渲染时要求开启深度测试、关闭抗锯齿和仅深度模式，否则抛出 ValueError。
+        绘制顺序、Z-prepass、分块等只影响速度的设置对它没有作用。
+        """
+        if backend not in ("raster", "raycast"):
+            raise ValueError(f"未知的渲染后端: {backend}")
+        self.render_backend = backend
+
+    def setKernelBackend(self, backend="python"):
+        """
+        选择逐像素光栅化循环的实现，各实现输出逐像素一致
+
+        Args:
+            backend: "python" 为原始的逐像素循环；
+                     "numpy" 对每个三角形的包围盒向量化计算；
+                     "numba" 为 Numba 编译的并行循环（需要安装 numba）；
+                     "auto" 安装了 numba 时用 numba，否则用 numpy
+        """
+        if backend == "python":
+            self._kernels = None
+        else:
+            from .kernels import get_kernels
+
+            self._kernels = get_kernels(backend)
+        self.kernel_backend = backend
+
+    def setCache(self, cache):
+        """
+        设置渲染结果缓存
+
+        Args:
+            cache: RenderCache 对象，相同场景和设置的重复渲染直接返回缓存的帧缓冲；
+                   传 None 关闭缓存
+        """
+        self.cache = cache
+
+    def setShadowMap(self, shadow_map, strength=0.6):
+        """
+        设置阴影贴图
+
+        Args:
+            shadow_map: ShadowMap 对象，传 None 关闭阴影
+            strength: 阴影强度，被遮挡处颜色乘以 (1 - strength)
+        """
+        self.shadow_map = shadow_map
+        self.shadow_strength = strength
+
     @staticmethod
     def _generate_sample_points(samples):
         """
@@ -80,6 +207,10 @@ class Rasterization:
 
     def rasterize_triangle(self, t):
         """光栅化一个三角形"""
+        self._rasterize_screen_triangle(self._to_screen(t))
+
+    def _to_screen(self, t: Triangle) -> Triangle:
+        """把三角形变换到屏幕空间，z 分量保存 NDC 深度"""
         H, W, _ = self.color_buf.shape
 
         # 变换到裁剪空间
@@ -101,7 +232,14 @@ class Rasterization:
             screen_x = v4[i, 0] * W
             screen_y = (1.0 - v4[i, 1]) * H  # 翻转Y轴：1-y
             screen_t.setVertex(i, screen_x, screen_y, depth_values[i])
-            screen_t.setColor(i, t.colors[i, 0], t.colors[i, 1], t.colors[i, 2])
+            if not self.depth_only:
+                screen_t.setColor(i, t.colors[i, 0], t.colors[i, 1], t.colors[i, 2])
+
+        return screen_t
+
+    def _rasterize_screen_triangle(self, screen_t: Triangle) -> None:
+        """光栅化一个已经在屏幕空间的三角形"""
+        H, W, _ = self.color_buf.shape
 
         # 计算边界框
         vertices = screen_t.vertices
@@ -112,7 +250,13 @@ class Rasterization:
         max_y = min(H - 1, int(max(vertices[:, 1]) + 1))
 
         # 光栅化
-        if self.enable_antialiasing:
+        if self.tile_size and not self.enable_antialiasing:
+            self._rasterize_tiled(screen_t, min_x, max_x, min_y, max_y)
+        elif self._kernels is not None:
+            self._rasterize_kernel(screen_t, min_x, max_x, min_y, max_y)
+        elif self.depth_only:
+            self._rasterize_depth_only(screen_t, min_x, max_x, min_y, max_y)
+        elif self.enable_antialiasing:
             self._rasterize_msaa(screen_t, min_x, max_x, min_y, max_y)
         else:
             self._rasterize_standard(screen_t, min_x, max_x, min_y, max_y)
@@ -137,7 +281,11 @@ class Rasterization:
                     x + 0.5, y + 0.5, 0, barycentric
                 ):  # 这个像素的中心在三角形内
                     new_depth = t.interpolate_depth(barycentric)
-                    if new_depth <= self.depth_buf[y, x]:  # 深度更小
+                    if self._depth_equal:
+                        # Z-prepass 之后，只有最终可见的片元才着色
+                        if new_depth == self.depth_buf[y, x]:
+                            self.color_buf[y, x] = t.interpolate_color(barycentric)
+                    elif new_depth <= self.depth_buf[y, x]:  # 深度更小
                         self.depth_buf[y, x] = new_depth
                         self.color_buf[y, x] = t.interpolate_color(barycentric)
 
@@ -145,6 +293,8 @@ class Rasterization:
         self, t: Triangle, min_x: int, max_x: int, min_y: int, max_y: int
     ) -> None:
         """标准光栅化，禁用深度测试"""
+        # 接收阴影时需要记录深度，用于重建片元的世界坐标
+        record_depth = self.shadow_map is not None
         for y in range(min_y, max_y + 1):  # y = min_y .. max_y
             for x in range(min_x, max_x + 1):  # x = min_x .. max_x
                 barycentric = t.compute_barycentric(x + 0.5, y + 0.5, 0)
@@ -152,11 +302,175 @@ class Rasterization:
                     x + 0.5, y + 0.5, 0, barycentric
                 ):  # 这个像素的中心在三角形内
                     self.color_buf[y, x] = t.interpolate_color(barycentric)
+                    if record_depth:
+                        self.depth_buf[y, x] = t.interpolate_depth(barycentric)
+
+    def _rasterize_depth_only(
+        self, t: Triangle, min_x: int, max_x: int, min_y: int, max_y: int
+    ) -> None:
+        """仅深度光栅化，不插值颜色"""
+        for y in range(min_y, max_y + 1):  # y = min_y .. max_y
+            for x in range(min_x, max_x + 1):  # x = min_x .. max_x
+                barycentric = t.compute_barycentric(x + 0.5, y + 0.5, 0)
+                if t.inside(x + 0.5, y + 0.5, 0, barycentric):
+                    new_depth = t.interpolate_depth(barycentric)
+                    if not self.enable_depth_test or new_depth <= self.depth_buf[y, x]:
+                        self.depth_buf[y, x] = new_depth
+
+    def _rasterize_kernel(
+        self, t: Triangle, min_x: int, max_x: int, min_y: int, max_y: int
+    ) -> None:
+        """用 setKernelBackend 选择的内核光栅化，分支与逐像素循环的各个版本一一对应"""
+        if self.enable_antialiasing and not self.depth_only:
+            self._kernels.raster_msaa(
+                t.vertices,
+                t.colors,
+                min_x,
+                max_x,
+                min_y,
+                max_y,
+                np.asarray(self.sample_points, dtype=np.float64),
+                self.color_buf,
+                self.depth_buf,
+                self.shadow_map is not None,
+            )
+            return
+
+        self._kernels.raster_triangle(
+            t.vertices,
+            t.colors,
+            min_x,
+            max_x,
+            min_y,
+            max_y,
+            self.color_buf,
+            self.depth_buf,
+            self.enable_depth_test,
+            self._depth_equal and not self.depth_only,
+            not self.depth_only,
+            self.depth_only or self.shadow_map is not None,
+        )
+
+    def _rasterize_tiled(
+        self, t: Triangle, min_x: int, max_x: int, min_y: int, max_y: int
+    ) -> None:
+        """分层光栅化：粗层按块分类，细层只处理部分覆盖的块"""
+        if min_x > max_x or min_y > max_y:
+            return
+
+        (xA, yA, _), (xB, yB, _), (xC, yC, _) = t.vertices
+        S = (xB - xA) * (yC - yA) - (xC - xA) * (yB - yA)
+        if S == 0:  # 退化三角形
+            return
+
+        # 重心坐标 a, b, c 都是屏幕坐标的线性函数 e(x, y) = A * x + B * y + C，
+        # 每行依次是 (A, B, C)，与 Triangle.compute_barycentric 等价
+        edges = (
+            np.array(
+                [
+                    [yB - yC, xC - xB, xB * yC - xC * yB],
+                    [yC - yA, xA - xC, xC * yA - xA * yC],
+                    [yA - yB, xB - xA, xA * yB - xB * yA],
+                ]
+            )
+            / S
+        )
+
+        # 粗层：在每个块四个角的像素中心处计算边函数
+        ts = self.tile_size
+        tile_x0 = np.arange(min_x, max_x + 1, ts)
+        tile_y0 = np.arange(min_y, max_y + 1, ts)
+        tile_x1 = np.minimum(tile_x0 + ts - 1, max_x)
+        tile_y1 = np.minimum(tile_y0 + ts - 1, max_y)
+        corner_x = np.stack((tile_x0, tile_x1, tile_x0, tile_x1))[:, None, :] + 0.5
+        corner_y = np.stack((tile_y0, tile_y0, tile_y1, tile_y1))[:, :, None] + 0.5
+
+        # (3, 4, 块行数, 块列数)
+        corner_e = (
+            edges[:, 0, None, None, None] * corner_x[None]
+            + edges[:, 1, None, None, None] * corner_y[None]
+            + edges[:, 2, None, None, None]
+        )
+        # 边函数是线性的，块内的最小值一定在角点取得
+        rejected = (corner_e < 0).all(axis=1).any(axis=0)
+        full = (corner_e >= 0).all(axis=(0, 1))
+        partial = ~rejected & ~full
+        if not (full.any() or partial.any()):
+            return
+
+        # 把块的分类展开到像素
+        h, w = max_y - min_y + 1, max_x - min_x + 1
+        full_px = full.repeat(ts, axis=0).repeat(ts, axis=1)[:h, :w]
+        partial_px = partial.repeat(ts, axis=0).repeat(ts, axis=1)[:h, :w]
+
+        xs = np.arange(min_x, max_x + 1) + 0.5
+        ys = np.arange(min_y, max_y + 1) + 0.5
+
+        # 细层：只对部分覆盖块内的像素做内部测试
+        covered = full_px
+        if partial_px.any():
+            py, px = np.nonzero(partial_px)
+            e = (
+                edges[:, 0, None] * xs[px]
+                + edges[:, 1, None] * ys[py]
+                + edges[:, 2, None]
+            )
+            covered = covered.copy()
+            covered[py, px] = (e >= 0).all(axis=0)
+
+        # 用平面方程插值深度和颜色：以顶点 A 为基准，
+        # f(x, y) = fA + ∇b · (fB - fA) + ∇c · (fC - fA) 沿 (x - xA, y - yA)，
+        # 顶点属性相同时结果严格等于该常数
+        dx, dy = xs - xA, ys - yA
+
+        def plane(values):
+            """求属性的平面方程梯度，返回 (基准值, x 梯度, y 梯度)"""
+            delta = values[1:] - values[:1]
+            grad = edges[1:, :2].T @ delta
+            return values[0], grad[0], grad[1]
+
+        z0, dzdx, dzdy = plane(t.vertices[:, 2])
+        depth = z0 + dzdx * dx[None, :] + dzdy * dy[:, None]
+
+        region = (slice(min_y, max_y + 1), slice(min_x, max_x + 1))
+        depth_region = self.depth_buf[region]
+        if self.enable_depth_test:
+            if self._depth_equal:
+                passed = covered & (depth == depth_region)
+            else:
+                passed = covered & (depth <= depth_region)
+        else:
+            passed = covered
+
+        all_passed = passed.all()
+        write_depth = (
+            (self.enable_depth_test and not self._depth_equal)
+            or self.depth_only
+            or self.shadow_map is not None
+        )
+        if write_depth:
+            if all_passed:
+                depth_region[...] = depth
+            else:
+                depth_region[passed] = depth[passed]
+
+        if not self.depth_only:
+            c0, dcdx, dcdy = plane(t.colors)
+            color_region = self.color_buf[region]
+            if all_passed:
+                # 整个包围盒都被覆盖，直接整块填充
+                color_region[...] = (
+                    c0 + dcdx * dx[None, :, None] + dcdy * dy[:, None, None]
+                )
+            else:
+                py, px = np.nonzero(passed)
+                color_region[py, px] = c0 + dcdx * dx[px, None] + dcdy * dy[py, None]
 
     def _rasterize_msaa(
         self, t: Triangle, min_x: int, max_x: int, min_y: int, max_y: int
     ) -> None:
         """MSAA抗锯齿光栅化"""
+        record_depth = self.shadow_map is not None
         for y in range(min_y, max_y + 1):  # y = min_y .. max_y
             for x in range(min_x, max_x + 1):  # x = min_x .. max_x
                 color_sum = np.zeros(3)
@@ -165,20 +479,367 @@ class Rasterization:
                     barycentric = t.compute_barycentric(center_x, center_y, 0)
                     if t.inside(center_x, center_y, 0, barycentric):
                         color_sum += t.interpolate_color(barycentric)
+                        if record_depth:
+                            self.depth_buf[y, x] = t.interpolate_depth(barycentric)
                 self.color_buf[y, x] = color_sum / len(self.sample_points)
 
     def render(self, t_list):
         """渲染三角形列表"""
+        if self.cache is None:
+            self._render(t_list)
+            return
+
+        t_list = list(t_list)
+        key = render_key(self, *stack_triangles(t_list))
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.color_buf, self.depth_buf = cached
+            return
+
+        self._render(t_list)
+        self.cache.put(key, self.color_buf, self.depth_buf)
+
+    def render_arrays(self, vertices, colors=None):
+        """
+        渲染以数组表示的三角形，结果与 render 相同，但不创建 Triangle 对象
+
+        Args:
+            vertices: (N, 3, 3) 顶点坐标
+            colors: (N, 3, 3) 顶点颜色，为 None 时为白色
+        """
+        vertices = np.asarray(vertices, dtype=np.float64)
+        if colors is None:
+            colors = np.ones(vertices.shape)
+        colors = np.asarray(colors, dtype=np.float64)
+
+        if self.cache is None:
+            self._render_arrays(vertices, colors)
+            return
+
+        key = render_key(self, vertices, colors)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.color_buf, self.depth_buf = cached
+            return
+
+        self._render_arrays(vertices, colors)
+        self.cache.put(key, self.color_buf, self.depth_buf)
+
+    def _reorder_allowed(self):
+        """只有开启深度测试、且不依赖绘制顺序时，才能重排或做 Z-prepass"""
+        # MSAA 路径不做深度测试，因此也排除在外
+        return (
+            self.enable_depth_test
+            and not self.enable_antialiasing
+            and (self.enable_draw_order or self.enable_z_prepass)
+        )
+
+    def _render(self, t_list):
+        """渲染三角形列表（不经过缓存）"""
+        if (
+            self.render_backend == "raycast"
+            or self._reorder_allowed()
+            or self.micro_triangle_area
+        ):
+            self._render_arrays(*stack_triangles(t_list))
+            return
+
         self.clear_buffers()
         for t in t_list:
             self.rasterize_triangle(t)
 
-    def save_image(self, filename):
-        """保存图像"""
-        Image.fromarray((np.clip(self.color_buf, 0, 1) * 255).astype("uint8")).save(
-            filename
+        if self.shadow_map is not None and not self.depth_only:
+            self._apply_shadow()
+
+    def _render_arrays(self, vertices, colors):
+        """渲染以数组表示的三角形（不经过缓存）"""
+        if self.render_backend == "raycast":
+            self._render_raycast(vertices, colors)
+            return
+
+        self.clear_buffers()
+
+        reorder = self._reorder_allowed()
+        screen = self._project_batch(vertices)
+
+        if reorder and self.enable_draw_order:
+            # 以最近顶点的深度作为排序键，从前往后；稳定排序保持同深度的原顺序
+            order = np.argsort(screen[:, :, 2].min(axis=1), kind="stable")
+            screen, colors = screen[order], colors[order]
+
+        if reorder and self.enable_z_prepass and not self.depth_only:
+            # 第一遍：只写深度
+            self.depth_only = True
+            try:
+                self._rasterize_batch(screen, colors)
+            finally:
+                self.depth_only = False
+
+            # 第二遍：只对深度相等的片元着色
+            self._depth_equal = True
+            try:
+                self._rasterize_batch(screen, colors)
+            finally:
+                self._depth_equal = False
+        else:
+            self._rasterize_batch(screen, colors)
+
+        if self.shadow_map is not None and not self.depth_only:
+            self._apply_shadow()
+
+    def render_stream(self, chunks):
+        """
+        以流的方式渲染三角形，峰值内存只取决于块的大小
+
+        每个块依次变换、光栅化后即被丢弃，因此可以渲染生成器产生的、
+        或从文件中分块读取的超大场景。块内支持绘制顺序优化，
+        但 Z-prepass、光线投射后端和渲染缓存需要完整场景，流式渲染不支持。
+
+        Args:
+            chunks: 可迭代对象，每个元素为 (n, 3, 3) 的顶点数组，
+                    或 (vertices, colors) 元组；只给顶点时颜色为白色
+        """
+        if self.render_backend != "raster":
+            raise ValueError("流式渲染只支持光栅化后端")
+
+        self.clear_buffers()
+        sort = (
+            self.enable_depth_test
+            and not self.enable_antialiasing
+            and self.enable_draw_order
+        )
+
+        for chunk in chunks:
+            if isinstance(chunk, tuple):
+                vertices, colors = chunk
+            else:
+                vertices, colors = chunk, None
+            vertices = np.asarray(vertices, dtype=np.float64)
+            if len(vertices) == 0:
+                continue
+            if colors is None:
+                colors = np.ones(vertices.shape)
+            colors = np.asarray(colors, dtype=np.float64)
+
+            screen = self._project_batch(vertices)
+            if sort:
+                order = np.argsort(screen[:, :, 2].min(axis=1), kind="stable")
+                screen, colors = screen[order], colors[order]
+            self._rasterize_batch(screen, colors)
+
+        if self.shadow_map is not None and not self.depth_only:
+            self._apply_shadow()
+
+    def _render_raycast(self, vertices, colors):
+        """用光线投射后端渲染，BVH 在多次渲染之间复用"""
+        from .raytracer import RayCaster
+
+        # 光线投射无法实现的设置直接报错，不悄悄得到与光栅化不同的图像
+        if not self.enable_depth_test:
+            raise ValueError("光线投射后端总是取最近的交点，需要开启深度测试")
+        if self.enable_antialiasing:
+            raise ValueError("光线投射后端不支持抗锯齿")
+        if self.depth_only:
+            raise ValueError("光线投射后端不支持仅深度模式")
+
+        if self._raycaster is None or (
+            self._raycaster.width,
+            self._raycaster.height,
+        ) != (self.width, self.height):
+            self._raycaster = RayCaster(self.width, self.height)
+
+        self._raycaster.setViewM(self.view_m)
+        self._raycaster.setProjM(self.proj_m)
+        self._raycaster.render_arrays(vertices, colors)
+        self.color_buf = self._raycaster.color_buf
+        self.depth_buf = self._raycaster.depth_buf
+
+        if self.shadow_map is not None and not self.depth_only:
+            self._apply_shadow()
+
+    def _project_batch(self, vertices: np.ndarray) -> np.ndarray:
+        """
+        批量把三角形变换到屏幕空间，与 _to_screen 的计算步骤一致
+
+        Args:
+            vertices: (N, 3, 3) 世界坐标
+        Returns:
+            (N, 3, 3) 屏幕坐标，z 分量保存 NDC 深度
+        """
+        H, W, _ = self.color_buf.shape
+
+        v4 = np.concatenate((vertices, np.ones(vertices.shape[:2] + (1,))), axis=2)
+        v4 = v4 @ (self.proj_m @ self.view_m).T
+
+        screen = np.empty(vertices.shape)
+        screen[:, :, 2] = v4[:, :, 2] / v4[:, :, 3]
+        ndc = v4[:, :, :2] / v4[:, :, 3:4] * 0.5 + 0.5
+        screen[:, :, 0] = ndc[:, :, 0] * W
+        screen[:, :, 1] = (1.0 - ndc[:, :, 1]) * H  # 翻转Y轴：1-y
+        return screen
+
+    def _rasterize_batch(self, screen: np.ndarray, colors: np.ndarray) -> None:
+        """
+        按顺序光栅化一批屏幕空间三角形
+
+        微小三角形攒成一批走向量化的 splat 路径，其余三角形逐个走常规路径。
+        只合并连续的微小三角形，遇到常规三角形时先提交之前攒下的批次，
+        保持绘制顺序不变：关闭深度测试时后画的覆盖先画的，开启深度测试时
+        深度相等的片元也与逐个绘制时一样由后画的获胜。
+        """
+        n = len(screen)
+        micro = self._micro_triangle_mask(screen)
+
+        start = 0
+        for i in np.flatnonzero(~micro).tolist() + [n]:
+            # [start, i) 都是微小三角形
+            for j in range(start, i, MICRO_BATCH_SIZE):
+                k = min(i, j + MICRO_BATCH_SIZE)
+                self._splat_micro_triangles(screen[j:k], colors[j:k])
+            if i < n:
+                self._rasterize_screen_triangle(
+                    self._screen_triangle(screen, colors, i)
+                )
+            start = i + 1
+
+    @staticmethod
+    def _screen_triangle(screen: np.ndarray, colors: np.ndarray, i: int) -> Triangle:
+        """由批量数组中的一行构建屏幕空间三角形"""
+        screen_t = Triangle()
+        screen_t.vertices = screen[i]
+        screen_t.colors = colors[i]
+        return screen_t
+
+    def _micro_triangle_mask(self, screen: np.ndarray) -> np.ndarray:
+        """找出可以走 splat 路径的微小三角形"""
+        if not self.micro_triangle_area or self.enable_antialiasing:
+            return np.zeros(len(screen), dtype=bool)
+
+        x, y = screen[:, :, 0], screen[:, :, 1]
+        area = 0.5 * np.abs(
+            (x[:, 1] - x[:, 0]) * (y[:, 2] - y[:, 0])
+            - (x[:, 2] - x[:, 0]) * (y[:, 1] - y[:, 0])
+        )
+        # 包围盒跨度小于 MICRO_SPAN - 1 时，覆盖的像素中心一定在
+        # 以最左上中心为起点的 MICRO_SPAN x MICRO_SPAN 个候选之中
+        extent_x = x.max(axis=1) - x.min(axis=1)
+        extent_y = y.max(axis=1) - y.min(axis=1)
+        return (
+            (area < self.micro_triangle_area)
+            & (extent_x < MICRO_SPAN - 1)
+            & (extent_y < MICRO_SPAN - 1)
         )
 
+    def _splat_micro_triangles(self, screen: np.ndarray, colors: np.ndarray) -> None:
+        """
+        向量化地光栅化一批微小三角形
+
+        每个三角形只测试包围盒附近 MICRO_SPAN x MICRO_SPAN 个像素中心，
+        深度测试用 np.minimum.at 做 scatter-min，再写入获胜片元的颜色。
+        """
+        H, W, _ = self.color_buf.shape
+
+        # 候选像素：以包围盒左上方第一个像素中心为起点
+        x0 = np.ceil(screen[:, :, 0].min(axis=1) - 0.5).astype(np.int64)
+        y0 = np.ceil(screen[:, :, 1].min(axis=1) - 0.5).astype(np.int64)
+        offsets = np.arange(MICRO_SPAN)
+        px = (x0[:, None, None] + offsets[None, None, :]).repeat(MICRO_SPAN, axis=1)
+        py = (y0[:, None, None] + offsets[None, :, None]).repeat(MICRO_SPAN, axis=2)
+        px, py = px.reshape(len(screen), -1), py.reshape(len(screen), -1)
+        x, y = px + 0.5, py + 0.5
+
+        # 与 Triangle.compute_barycentric 相同的计算步骤
+        xA, xB, xC = (screen[:, i, 0, None] for i in range(3))
+        yA, yB, yC = (screen[:, i, 1, None] for i in range(3))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            S = (xB - xA) * (yC - yA) - (xC - xA) * (yB - yA)
+            c = ((xA - x) * (yB - y) - (xB - x) * (yA - y)) / S
+            a = ((xB - x) * (yC - y) - (xC - x) * (yB - y)) / S
+            b = ((xC - x) * (yA - y) - (xA - x) * (yC - y)) / S
+
+        inside = (
+            (a >= 0)
+            & (b >= 0)
+            & (c >= 0)
+            & (S != 0)
+            & (px >= 0)
+            & (px < W)
+            & (py >= 0)
+            & (py < H)
+        )
+        tri, cand = np.nonzero(inside)  # 按三角形顺序排列的片元
+        if len(tri) == 0:
+            return
+
+        bary = np.stack((a[tri, cand], b[tri, cand], c[tri, cand]), axis=1)
+        # 与 Triangle.interpolate_depth 一样显式写出加权和，深度逐位一致，相等深度的判定才相同
+        z = screen[tri, :, 2]
+        depth = bary[:, 0] * z[:, 0] + bary[:, 1] * z[:, 1] + bary[:, 2] * z[:, 2]
+        idx = py[tri, cand] * W + px[tri, cand]
+
+        depth_flat = self.depth_buf.reshape(-1)
+        if self.enable_depth_test:
+            if self._depth_equal:
+                passed = depth == depth_flat[idx]
+            else:
+                # scatter-min 得到每个像素的最终深度，深度等于它的片元获胜
+                np.minimum.at(depth_flat, idx, depth)
+                passed = depth == depth_flat[idx]
+            tri, idx, bary, depth = (
+                tri[passed],
+                idx[passed],
+                bary[passed],
+                depth[passed],
+            )
+
+        # 同一像素有多个片元时保留最后绘制的那个，与逐个三角形绘制的结果一致
+        _, last = np.unique(idx[::-1], return_index=True)
+        keep = len(idx) - 1 - last
+        tri, idx, bary, depth = tri[keep], idx[keep], bary[keep], depth[keep]
+
+        if self.depth_only or self.shadow_map is not None:
+            depth_flat[idx] = depth
+        if not self.depth_only:
+            self.color_buf.reshape(-1, 3)[idx] = np.einsum(
+                "ij,ijk->ik", bary, colors[tri]
+            )
+
+    def _apply_shadow(self):
+        """
+        阴影后处理：由深度缓冲重建每个片元的世界坐标，
+        一次性向量化地查询阴影贴图，再按可见度衰减颜色
+        """
+        ys, xs = np.nonzero(self.depth_buf < np.finfo(np.float32).max)
+        if len(ys) == 0:
+            return
+
+        # 屏幕空间 -> NDC（与 rasterize_triangle 中的变换互逆）
+        ndc = np.empty((len(ys), 4))
+        ndc[:, 0] = (xs + 0.5) / self.width * 2.0 - 1.0
+        ndc[:, 1] = 1.0 - (ys + 0.5) / self.height * 2.0
+        ndc[:, 2] = self.depth_buf[ys, xs]
+        ndc[:, 3] = 1.0
+
+        # NDC -> 世界坐标
+        world = (np.linalg.inv(self.proj_m @ self.view_m) @ ndc.T).T
+        world = world[:, :3] / world[:, 3:4]
+
+        visibility = self.shadow_map.lookup(world)
+        self.color_buf[ys, xs] *= (1.0 - self.shadow_strength * (1.0 - visibility))[
+            :, None
+        ]
+
+    def save_image(self, filename, compress_level=6):
+        """
+        保存图像，格式由扩展名决定（.png / .ppm / .bmp / .npy）
+
+        需要在渲染循环中输出大量帧时，使用 core.image_io.ImageSink 在后台编码。
+        """
+        write_image(self.color_buf, filename, compress_level)
+
     def show_image(self):
         """显示图像"""
+        from PIL import Image
+
         Image.fromarray((np.clip(self.color_buf, 0, 1) * 255).astype("uint8")).show()
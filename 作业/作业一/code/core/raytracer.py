@@ -0,0 +1,383 @@
+"""
+光线投射模块
+包含基于 SAH 的层次包围盒（BVH）和向量化的光线投射渲染器
+"""
+
+import numpy as np
+
+from .geometry import stack_triangles
+from .image_io import write_image
+
+# SAH 代价：遍历一个节点与求交一个三角形的相对代价
+SAH_TRAVERSAL_COST = 1.0
+SAH_INTERSECT_COST = 1.0
+
+
+def _surface_area(box_min: np.ndarray, box_max: np.ndarray) -> np.ndarray:
+    """包围盒表面积（最后一维为 xyz）"""
+    d = np.maximum(box_max - box_min, 0.0)
+    return 2.0 * (d[..., 0] * d[..., 1] + d[..., 1] * d[..., 2] + d[..., 2] * d[..., 0])
+
+
+class BVH:
+    """
+    层次包围盒，所有节点保存在扁平的 NumPy 数组中
+
+    节点 i 的包围盒为 node_min[i] .. node_max[i]；
+    内部节点的子节点为 node_left[i] 和 node_right[i]，叶子节点的 node_left[i] 为 -1，
+    其三角形为 tri_index[node_start[i] : node_start[i] + node_count[i]]。
+    """
+
+    def __init__(self, vertices: np.ndarray, leaf_size=4, max_leaf_size=16):
+        """
+        Args:
+            vertices: (N, 3, 3) 三角形顶点
+            leaf_size: 三角形数量不超过该值时直接作为叶子
+            max_leaf_size: SAH 认为不划分更划算时，叶子允许的最大三角形数量
+        """
+        self.vertices = np.ascontiguousarray(vertices, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self.max_leaf_size = max(leaf_size, max_leaf_size)
+        self._build()
+
+    def __len__(self):
+        return len(self.node_min)
+
+    def _build(self):
+        """用排序扫描的 SAH 自顶向下构建"""
+        n = len(self.vertices)
+        tri_min = self.vertices.min(axis=1)
+        tri_max = self.vertices.max(axis=1)
+        centroids = self.vertices.mean(axis=1)
+
+        tri_index = np.arange(n)
+        node_min, node_max = [], []
+        node_left, node_right = [], []
+        node_start, node_count = [], []
+
+        def new_node(start, count):
+            node_min.append(None)
+            node_max.append(None)
+            node_left.append(-1)
+            node_right.append(-1)
+            node_start.append(start)
+            node_count.append(count)
+            return len(node_min) - 1
+
+        stack = [new_node(0, n)] if n else []
+        while stack:
+            node = stack.pop()
+            start, count = node_start[node], node_count[node]
+            ids = tri_index[start : start + count]
+            box_min = tri_min[ids].min(axis=0)
+            box_max = tri_max[ids].max(axis=0)
+            node_min[node], node_max[node] = box_min, box_max
+
+            if count <= self.leaf_size:
+                continue
+
+            split = self._find_split(ids, tri_min, tri_max, centroids, box_min, box_max)
+            if split is None:
+                continue
+
+            order, left_count = split
+            tri_index[start : start + count] = ids[order]
+
+            left = new_node(start, left_count)
+            right = new_node(start + left_count, count - left_count)
+            node_left[node], node_right[node] = left, right
+            node_count[node] = 0
+            stack.append(right)
+            stack.append(left)
+
+        self.tri_index = tri_index
+        self.node_min = np.array(node_min, dtype=np.float64).reshape(-1, 3)
+        self.node_max = np.array(node_max, dtype=np.float64).reshape(-1, 3)
+        self.node_left = np.array(node_left, dtype=np.int64)
+        self.node_right = np.array(node_right, dtype=np.int64)
+        self.node_start = np.array(node_start, dtype=np.int64)
+        self.node_count = np.array(node_count, dtype=np.int64)
+
+        # 按叶子顺序重排的三角形，求交时连续访问
+        v = self.vertices[tri_index]
+        self.v0 = v[:, 0]
+        self.edge1 = v[:, 1] - v[:, 0]
+        self.edge2 = v[:, 2] - v[:, 0]
+
+    def _find_split(self, ids, tri_min, tri_max, centroids, box_min, box_max):
+        """
+        在三个轴上按质心排序，扫描所有划分位置，选 SAH 代价最小的一个
+
+        Returns:
+            (排序后的下标, 左侧三角形数量)，不值得划分时返回 None
+        """
+        count = len(ids)
+        parent_area = _surface_area(box_min, box_max)
+        best_cost, best = np.inf, None
+
+        for axis in range(3):
+            order = np.argsort(centroids[ids, axis], kind="stable")
+            lo, hi = tri_min[ids[order]], tri_max[ids[order]]
+
+            # 前缀/后缀包围盒：left_area[i] 为前 i+1 个三角形的面积
+            left_area = _surface_area(
+                np.minimum.accumulate(lo, axis=0), np.maximum.accumulate(hi, axis=0)
+            )[:-1]
+            right_area = _surface_area(
+                np.minimum.accumulate(lo[::-1], axis=0)[::-1],
+                np.maximum.accumulate(hi[::-1], axis=0)[::-1],
+            )[1:]
+            left_n = np.arange(1, count)
+
+            cost = left_area * left_n + right_area * (count - left_n)
+            i = int(np.argmin(cost))
+            if cost[i] < best_cost:
+                best_cost, best = cost[i], (order, i + 1)
+
+        if parent_area > 0:
+            best_cost = (
+                SAH_TRAVERSAL_COST + SAH_INTERSECT_COST * best_cost / parent_area
+            )
+        else:
+            # 所有三角形都退化到同一点，SAH 无法区分，按数量对半分
+            best_cost = SAH_TRAVERSAL_COST + SAH_INTERSECT_COST * count / 2
+
+        if best_cost >= SAH_INTERSECT_COST * count and count <= self.max_leaf_size:
+            return None
+        return best
+
+    def intersect(self, origins: np.ndarray, directions: np.ndarray):
+        """
+        对一组光线求最近交点
+
+        以 (光线, 节点) 对为单位逐层展开遍历：每层先对所有对做 slab 测试，
+        再把命中的内部节点展开成子节点，命中的叶子展开成 (光线, 三角形) 对，
+        用 Möller–Trumbore 算法批量求交。已找到的最近交点用于剔除更远的节点。
+
+        Args:
+            origins: (R, 3) 光线起点
+            directions: (R, 3) 光线方向
+        Returns:
+            t: (R,) 交点参数，未命中为 inf
+            tri: (R,) 命中的三角形下标（对应构建时的顺序），未命中为 -1
+            u, v: (R,) 交点的重心坐标（对应顶点 1、2）
+        """
+        n_rays = len(origins)
+        t_best = np.full(n_rays, np.inf)
+        hit = np.full(n_rays, -1, dtype=np.int64)
+        u_best = np.zeros(n_rays)
+        v_best = np.zeros(n_rays)
+        if len(self) == 0 or n_rays == 0:
+            return t_best, hit, u_best, v_best
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_dir = 1.0 / directions
+
+        ray = np.arange(n_rays)
+        node = np.zeros(n_rays, dtype=np.int64)
+
+        while len(ray):
+            # slab 测试
+            with np.errstate(invalid="ignore"):
+                t0 = (self.node_min[node] - origins[ray]) * inv_dir[ray]
+                t1 = (self.node_max[node] - origins[ray]) * inv_dir[ray]
+            t_near = np.nanmax(np.minimum(t0, t1), axis=1)
+            t_far = np.nanmin(np.maximum(t0, t1), axis=1)
+            alive = (t_near <= t_far) & (t_far >= 0) & (t_near < t_best[ray])
+            ray, node = ray[alive], node[alive]
+
+            leaf = self.node_left[node] < 0
+            if leaf.any():
+                self._intersect_leaves(
+                    ray[leaf],
+                    node[leaf],
+                    origins,
+                    directions,
+                    t_best,
+                    hit,
+                    u_best,
+                    v_best,
+                )
+
+            # 内部节点展开为两个子节点
+            inner = ~leaf
+            ray = np.concatenate((ray[inner], ray[inner]))
+            node = np.concatenate(
+                (self.node_left[node[inner]], self.node_right[node[inner]])
+            )
+
+        hit_tri = np.where(hit >= 0, self.tri_index[np.maximum(hit, 0)], -1)
+        return t_best, hit_tri, u_best, v_best
+
+    def _intersect_leaves(
+        self, ray, node, origins, directions, t_best, hit, u_best, v_best
+    ):
+        """把 (光线, 叶子) 对展开为 (光线, 三角形) 对并求交，更新最近交点"""
+        counts = self.node_count[node]
+        ray = np.repeat(ray, counts)
+        # 每个叶子内的三角形下标：start + 0, 1, ..., count - 1
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        tri = np.repeat(self.node_start[node], counts) + np.arange(len(ray)) - first
+
+        # Möller–Trumbore
+        d = directions[ray]
+        e1, e2 = self.edge1[tri], self.edge2[tri]
+        p = np.cross(d, e2)
+        det = np.einsum("ij,ij->i", e1, p)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_det = 1.0 / det
+            s = origins[ray] - self.v0[tri]
+            u = np.einsum("ij,ij->i", s, p) * inv_det
+            q = np.cross(s, e1)
+            v = np.einsum("ij,ij->i", d, q) * inv_det
+            t = np.einsum("ij,ij->i", e2, q) * inv_det
+
+        ok = (
+            (np.abs(det) > 1e-12)
+            & (u >= 0)
+            & (v >= 0)
+            & (u + v <= 1)
+            & (t >= 0)
+            & (t < t_best[ray])
+        )
+        if not ok.any():
+            return
+        ray, tri, t, u, v = ray[ok], tri[ok], t[ok], u[ok], v[ok]
+
+        # 每条光线只保留最近的交点
+        order = np.lexsort((t, ray))
+        ray, tri, t, u, v = ray[order], tri[order], t[order], u[order], v[order]
+        first = np.flatnonzero(np.r_[True, ray[1:] != ray[:-1]])
+        ray, tri, t, u, v = ray[first], tri[first], t[first], u[first], v[first]
+
+        t_best[ray] = t
+        hit[ray] = tri
+        u_best[ray] = u
+        v_best[ray] = v
+
+
+class RayCaster:
+    """
+    光线投射渲染器
+
+    与 Rasterization 使用相同的三角形列表和 LookAt/Perspective（或 Ortho）矩阵，
+    颜色缓冲和深度缓冲（NDC 深度）的约定也相同；颜色与光栅化器一样在屏幕空间插值，
+    因此在深度测试开启、无抗锯齿时结果可以直接对比。
+    """
+
+    def __init__(self, width, height, packet_size=4096, leaf_size=4):
+        self.width = width
+        self.height = height
+        self.packet_size = packet_size
+        self.leaf_size = leaf_size
+        self.color_buf = np.zeros((height, width, 3))
+        self.depth_buf = np.ones((height, width)) * np.finfo(np.float32).max
+        self.view_m = np.eye(4)
+        self.proj_m = np.eye(4)
+        self.bvh = None
+
+    def clear_buffers(self):
+        """原地清除缓冲区，反复渲染时不重新分配"""
+        self.color_buf.fill(0.0)
+        self.depth_buf.fill(np.finfo(np.float32).max)
+
+    def setViewM(self, mat):
+        self.view_m = mat
+
+    def setProjM(self, mat):
+        self.proj_m = mat
+
+    def build(self, vertices: np.ndarray) -> BVH:
+        """构建 BVH；顶点与上次相同时直接复用"""
+        if self.bvh is None or not np.array_equal(self.bvh.vertices, vertices):
+            self.bvh = BVH(vertices, leaf_size=self.leaf_size)
+        return self.bvh
+
+    def render(self, t_list):
+        """渲染三角形列表"""
+        vertices, colors = stack_triangles(t_list)
+        self.render_arrays(vertices, colors)
+
+    def render_arrays(self, vertices: np.ndarray, colors: np.ndarray):
+        """
+        渲染以数组表示的三角形
+
+        Args:
+            vertices: (N, 3, 3) 顶点坐标
+            colors: (N, 3, 3) 顶点颜色
+        """
+        self.clear_buffers()
+        bvh = self.build(vertices)
+
+        vp = self.proj_m @ self.view_m
+        inv_vp = np.linalg.inv(vp)
+        color_flat = self.color_buf.reshape(-1, 3)
+        depth_flat = self.depth_buf.reshape(-1)
+
+        n_pixels = self.width * self.height
+        for start in range(0, n_pixels, self.packet_size):
+            pixel = np.arange(start, min(n_pixels, start + self.packet_size))
+            origins, directions = self._generate_rays(pixel, inv_vp)
+
+            t, tri, _, _ = bvh.intersect(origins, directions)
+            found = tri >= 0
+            if not found.any():
+                continue
+            pixel, tri = pixel[found], tri[found]
+            hit_points = origins[found] + t[found, None] * directions[found]
+
+            # 颜色：与光栅化器一样按屏幕空间的重心坐标插值，而不是交点处
+            # （透视校正）的重心坐标，透视投影下两个后端的颜色也一致
+            w = self._screen_barycentric(vertices[tri], pixel, vp)
+            color_flat[pixel] = np.einsum("ij,ijk->ik", w, colors[tri])
+
+            # 深度：交点变换到 NDC，与光栅化器的深度缓冲一致
+            clip = np.hstack((hit_points, np.ones((len(pixel), 1)))) @ vp.T
+            depth_flat[pixel] = clip[:, 2] / clip[:, 3]
+
+    def _screen_barycentric(self, vertices: np.ndarray, pixel: np.ndarray, vp):
+        """
+        像素中心在三角形屏幕投影中的重心坐标，与 Triangle.compute_barycentric 一致
+
+        Args:
+            vertices: (R, 3, 3) 每个像素命中的三角形的世界坐标
+            pixel: (R,) 像素编号
+        Returns:
+            (R, 3) 重心坐标
+        """
+        clip = np.concatenate((vertices, np.ones(vertices.shape[:2] + (1,))), axis=2)
+        clip = clip @ vp.T
+        ndc = clip[:, :, :2] / clip[:, :, 3:4] * 0.5 + 0.5
+        sx = ndc[:, :, 0] * self.width
+        sy = (1.0 - ndc[:, :, 1]) * self.height
+
+        x = (pixel % self.width + 0.5)[:, None]
+        y = (pixel // self.width + 0.5)[:, None]
+        # 第 i 个重心坐标对应顶点 i 对面的边 (i + 1, i + 2)
+        dx1, dy1 = np.roll(sx, -1, axis=1) - x, np.roll(sy, -1, axis=1) - y
+        dx2, dy2 = np.roll(sx, -2, axis=1) - x, np.roll(sy, -2, axis=1) - y
+        areas = dx1 * dy2 - dx2 * dy1
+        return areas / areas.sum(axis=1, keepdims=True)
+
+    def _generate_rays(self, pixel: np.ndarray, inv_vp: np.ndarray):
+        """由像素中心生成光线：在 NDC 近平面和远平面上反投影，连线即为光线"""
+        xs, ys = pixel % self.width, pixel // self.width
+
+        ndc = np.empty((len(pixel), 2, 4))
+        ndc[:, :, 0] = ((xs + 0.5) / self.width * 2.0 - 1.0)[:, None]
+        ndc[:, :, 1] = (1.0 - (ys + 0.5) / self.height * 2.0)[:, None]
+        ndc[:, 0, 2] = -1.0  # 近平面
+        ndc[:, 1, 2] = 1.0  # 远平面
+        ndc[:, :, 3] = 1.0
+
+        world = ndc @ inv_vp.T
+        world = world[:, :, :3] / world[:, :, 3:4]
+        return world[:, 0], world[:, 1] - world[:, 0]
+
+    def save_image(self, filename, compress_level=6):
+        """
+        保存图像，格式由扩展名决定（.png / .ppm / .bmp / .npy）
+
+        需要在渲染循环中输出大量帧时，使用 core.image_io.ImageSink 在后台编码。
+        """
+        write_image(self.color_buf, filename, compress_level)
@@ -0,0 +1,195 @@
+"""
+场景文件模块
+把三角形场景保存为二进制文件，加载时通过 np.memmap 直接映射，不复制数据
+
+文件布局:
+    8 字节魔数 b"CGSCENE1"
+    4 字节小端无符号整数：JSON 头的长度
+    JSON 头：各数组的 dtype、shape 和在文件中的偏移
+    各数组的原始数据，起始偏移按 64 字节对齐
+
+多个进程映射同一个文件时共享操作系统的页缓存，大场景无需各自读入内存。
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from .geometry import iter_array_chunks, stack_triangles
+
+_MAGIC = b"CGSCENE1"
+_LENGTH = struct.Struct("<I")
+_ALIGN = 64
+
+# 场景中可以保存的数组
+_ARRAY_NAMES = ("vertices", "colors", "normals", "indices", "view_m", "proj_m")
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class Scene:
+    """三角形场景"""
+
+    def __init__(
+        self,
+        vertices,
+        colors=None,
+        normals=None,
+        indices=None,
+        view_m=None,
+        proj_m=None,
+    ):
+        """
+        Args:
+            vertices: (V, 3) 顶点坐标
+            colors: (V, 3) 顶点颜色，默认为白色
+            normals: (V, 3) 顶点法线，可选
+            indices: (F, 3) 三角形的顶点索引；不给出时每 3 个连续顶点组成一个三角形
+            view_m, proj_m: 相机的视图矩阵和投影矩阵，可选
+        """
+        self.vertices = vertices
+        self.colors = colors
+        self.normals = normals
+        self.indices = indices
+        self.view_m = view_m
+        self.proj_m = proj_m
+
+    @classmethod
+    def from_triangles(cls, t_list, view_m=None, proj_m=None):
+        """由三角形列表创建场景（不带索引）"""
+        vertices, colors = stack_triangles(t_list)
+        return cls(
+            vertices.reshape(-1, 3),
+            colors.reshape(-1, 3),
+            view_m=view_m,
+            proj_m=proj_m,
+        )
+
+    def __len__(self):
+        """三角形数量"""
+        if self.indices is not None:
+            return len(self.indices)
+        return len(self.vertices) // 3
+
+    def triangles(self):
+        """
+        返回 (N, 3, 3) 的顶点和颜色数组
+
+        不带索引时只是对原数组的 reshape，内存映射的场景不会被读入内存；
+        带索引时需要按索引收集顶点，会复制数据。
+        """
+        if self.indices is not None:
+            vertices = self.vertices[self.indices]
+            colors = None if self.colors is None else self.colors[self.indices]
+        else:
+            vertices = self.vertices.reshape(-1, 3, 3)
+            colors = None if self.colors is None else self.colors.reshape(-1, 3, 3)
+        return vertices, colors
+
+    def iter_chunks(self, chunk_size=65536):
+        """按块产生 (vertices, colors)，供 Rasterization.render_stream 使用"""
+        if self.indices is None:
+            yield from iter_array_chunks(*self.triangles(), chunk_size)
+            return
+
+        for start in range(0, len(self.indices), chunk_size):
+            ids = self.indices[start : start + chunk_size]
+            yield self.vertices[ids], (
+                None if self.colors is None else self.colors[ids]
+            )
+
+    def render(self, renderer, chunk_size=65536):
+        """用场景中的相机（如果有）设置渲染器，并以流的方式渲染整个场景"""
+        if self.view_m is not None:
+            renderer.setViewM(np.asarray(self.view_m))
+        if self.proj_m is not None:
+            renderer.setProjM(np.asarray(self.proj_m))
+        renderer.render_stream(self.iter_chunks(chunk_size))
+
+    def save(self, path, dtype=np.float64):
+        """
+        保存为场景文件
+
+        Args:
+            path: 文件路径
+            dtype: 顶点、颜色和法线的存储类型；
+                   float64 与 Rasterization 内部一致，加载后可以不经转换直接使用
+        """
+        arrays = {}
+        for name in _ARRAY_NAMES:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if name == "indices":
+                value = np.asarray(value)
+                index_dtype = (
+                    np.uint32 if value.size == 0 or value.max() < 2**32 else np.int64
+                )
+                value = value.astype(index_dtype)
+            elif name in ("view_m", "proj_m"):
+                value = np.asarray(value, dtype=np.float64)
+            else:
+                value = np.asarray(value, dtype=dtype)
+            arrays[name] = np.ascontiguousarray(value)
+
+        # 头的长度会影响数据的偏移，偏移相对数据区起点计算，最后统一平移
+        header = {"version": 1, "arrays": {}}
+        offset = 0
+        for name, value in arrays.items():
+            offset = _align(offset)
+            header["arrays"][name] = {
+                "dtype": value.dtype.str,
+                "shape": list(value.shape),
+                "offset": offset,
+            }
+            offset += value.nbytes
+
+        header_bytes = json.dumps(header).encode("utf-8")
+        data_start = _align(len(_MAGIC) + _LENGTH.size + len(header_bytes))
+
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(_LENGTH.pack(len(header_bytes)))
+            f.write(header_bytes)
+            for name, value in arrays.items():
+                f.seek(data_start + header["arrays"][name]["offset"])
+                f.write(value.tobytes())
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        加载场景文件
+
+        Args:
+            path: 文件路径
+            mmap: 为 True 时数组以只读的 np.memmap 返回，按需从页缓存读取；
+                  为 False 时整个读入内存
+        """
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} 不是场景文件")
+            (length,) = _LENGTH.unpack(f.read(_LENGTH.size))
+            header = json.loads(f.read(length).decode("utf-8"))
+        if header.get("version") != 1:
+            raise ValueError(f"不支持的场景文件版本: {header.get('version')}")
+
+        data_start = _align(len(_MAGIC) + _LENGTH.size + length)
+        arrays = {}
+        for name, info in header["arrays"].items():
+            dtype = np.dtype(info["dtype"])
+            shape = tuple(info["shape"])
+            offset = data_start + info["offset"]
+            if 0 in shape:
+                # np.memmap 不能映射长度为 0 的区域
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(path, dtype, "r", offset, shape)
+            else:
+                count = int(np.prod(shape))
+                arrays[name] = np.fromfile(path, dtype, count, offset=offset).reshape(
+                    shape
+                )
+        return cls(**arrays)
@@ -0,0 +1,342 @@
+"""
+渲染服务模块
+常驻进程维护一组预热好的 Rasterization 工作进程，通过本地 socket 接收渲染请求
+
+启动服务:
+    python -m core.service --port 8765 --workers 4
+
+客户端（asyncio）:
+    async with RenderClient("127.0.0.1", 8765) as client:
+        future = await client.submit(make_request(triangles, view_m, proj_m))
+        image = await future
+
+注意：消息使用 pickle 序列化，服务只应监听本机地址，供可信的本地进程使用。
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import os
+import pickle
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .geometry import stack_triangles
+from .rasterizer import Rasterization
+
+# 消息帧：4 字节大端长度 + pickle 数据
+_HEADER = struct.Struct(">I")
+
+# 工作进程内按分辨率缓存的渲染器，缓冲区只分配一次
+_worker_renderers = {}
+
+
+def make_request(
+    t_list,
+    view_m,
+    proj_m,
+    width=512,
+    height=512,
+    depth_test=False,
+    antialiasing=0,
+    **settings,
+):
+    """
+    构建一个渲染请求
+
+    Args:
+        t_list: 三角形列表，或 (vertices, colors) 数组元组
+        view_m, proj_m: 视图矩阵和投影矩阵
+        width, height: 分辨率
+        depth_test: 是否开启深度测试
+        antialiasing: MSAA 采样密度，0 表示关闭
+        **settings: 其他渲染设置，见 _configure
+    """
+    if isinstance(t_list, tuple):
+        vertices, colors = t_list
+    else:
+        vertices, colors = stack_triangles(t_list)
+    return {
+        "vertices": np.asarray(vertices, dtype=np.float64),
+        "colors": np.asarray(colors, dtype=np.float64),
+        "view_m": np.asarray(view_m, dtype=np.float64),
+        "proj_m": np.asarray(proj_m, dtype=np.float64),
+        "width": width,
+        "height": height,
+        "settings": dict(depth_test=depth_test, antialiasing=antialiasing, **settings),
+    }
+
+
+def _configure(renderer: Rasterization, settings: dict) -> None:
+    """把请求中的设置应用到复用的渲染器上，未给出的设置恢复默认值"""
+    renderer.enableDepthTest(settings.get("depth_test", False))
+    samples = settings.get("antialiasing", 0)
+    renderer.enableAntialiasing(samples > 0, max(1, samples))
+    renderer.enableDrawOrder(settings.get("draw_order", False))
+    renderer.enableZPrepass(settings.get("z_prepass", False))
+    renderer.enableTiledRasterization(
+        settings.get("tile_size", 0) > 0, settings.get("tile_size", 8)
+    )
+    renderer.enableMicroTriangles(
+        settings.get("micro_triangle_area", 0) > 0,
+        settings.get("micro_triangle_area", 1.0),
+    )
+    renderer.setRenderBackend(settings.get("backend", "raster"))
+    renderer.setKernelBackend(settings.get("kernel", "python"))
+
+
+def _init_worker():
+    """工作进程初始化：提前导入并创建一个默认分辨率的渲染器"""
+    _worker_renderers[(512, 512)] = Rasterization(512, 512)
+
+
+def _render_job(request: dict) -> np.ndarray:
+    """在工作进程中执行一个渲染请求，返回颜色缓冲"""
+    size = (request["width"], request["height"])
+    renderer = _worker_renderers.get(size)
+    if renderer is None:
+        renderer = _worker_renderers[size] = Rasterization(*size)
+
+    _configure(renderer, request.get("settings", {}))
+    renderer.setViewM(request["view_m"])
+    renderer.setProjM(request["proj_m"])
+    renderer.render_arrays(request["vertices"], request["colors"])
+    return renderer.color_buf
+
+
+async def _read_message(reader: asyncio.StreamReader):
+    """读取一帧消息，连接关闭时返回 None"""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+        (length,) = _HEADER.unpack(header)
+        return pickle.loads(await reader.readexactly(length))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def _encode_message(message) -> bytes:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(data)) + data
+
+
+def _is_loopback(host) -> bool:
+    """host 是否为本机回环地址（"localhost"、127.0.0.0/8 或 ::1）"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class RenderServer:
+    """常驻渲染服务"""
+
+    def __init__(self, host="127.0.0.1", port=8765, workers=None, max_queue=64):
+        """
+        Args:
+            host, port: 监听地址，只能是本机回环地址；port 为 0 时由系统分配
+            workers: 工作进程数，默认等于 CPU 核数
+            max_queue: 等待执行的请求上限，队列满时停止读取连接，形成背压
+        """
+        # 消息用 pickle 反序列化，监听其他地址相当于允许远程执行任意代码
+        if not _is_loopback(host):
+            raise ValueError(f"渲染服务只能监听本机回环地址: {host}")
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._pool = None
+        self._server = None
+        self._queue = None
+        self._dispatchers = []
+        self._clients = set()
+
+    async def start(self):
+        """启动工作进程池和监听 socket"""
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        self._queue = asyncio.Queue(self.max_queue)
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch()) for _ in range(self.workers)
+        ]
+        self._server = await asyncio.start_server(
+            self._handle_client, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        print(f"渲染服务已启动: {self.host}:{self.port}，{self.workers} 个工作进程")
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """停止服务并关闭工作进程"""
+        if self._server is not None:
+            self._server.close()
+        for task in self._clients:
+            task.cancel()
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    async def _handle_client(self, reader, writer):
+        """读取一个连接上的请求并放入队列；队列满时 put 会阻塞，不再读取 socket"""
+        conn = _Connection(writer)
+        task = asyncio.current_task()
+        self._clients.add(task)
+        try:
+            while (message := await _read_message(reader)) is not None:
+                conn.pending += 1
+                conn.idle.clear()
+                await self._queue.put((conn, message))
+            # 等待这个连接上已提交的请求写完再关闭
+            await conn.idle.wait()
+        except asyncio.CancelledError:
+            pass  # 服务关闭
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    async def _dispatch(self):
+        """从队列取出请求，交给工作进程执行，再把结果写回对应的连接"""
+        loop = asyncio.get_running_loop()
+        while True:
+            conn, message = await self._queue.get()
+            try:
+                image = await loop.run_in_executor(
+                    self._pool, _render_job, message["request"]
+                )
+                response = {"id": message["id"], "image": image}
+            except Exception as e:
+                response = {"id": message["id"], "error": repr(e)}
+
+            try:
+                async with conn.lock:
+                    conn.writer.write(_encode_message(response))
+                    await conn.writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                conn.pending -= 1
+                if conn.pending == 0:
+                    conn.idle.set()
+
+
+class _Connection:
+    """服务端的一个客户端连接"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.lock = asyncio.Lock()  # 多个分发任务写同一个连接时互斥
+        self.pending = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+
+class RenderClient:
+    """渲染服务的 asyncio 客户端"""
+
+    def __init__(self, host="127.0.0.1", port=8765, max_inflight=32):
+        """
+        Args:
+            host, port: 服务地址
+            max_inflight: 同时在途的请求上限，达到上限时 submit 会等待
+        """
+        self.host = host
+        self.port = port
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._futures = {}
+        self._next_id = 0
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._reader_task = asyncio.create_task(self._read_responses())
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def submit(self, request: dict) -> asyncio.Future:
+        """
+        提交一个渲染请求（由 make_request 构建）
+
+        Returns:
+            Future，完成时得到 (height, width, 3) 的颜色缓冲
+        """
+        await self._slots.acquire()
+        request_id = self._next_id
+        self._next_id += 1
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures[request_id] = future
+
+        self._writer.write(_encode_message({"id": request_id, "request": request}))
+        await self._writer.drain()
+        return future
+
+    async def render(self, request: dict) -> np.ndarray:
+        """提交请求并等待结果"""
+        return await (await self.submit(request))
+
+    async def _read_responses(self):
+        """读取服务端的响应，完成对应的 Future"""
+        while (message := await _read_message(self._reader)) is not None:
+            future = self._futures.pop(message["id"], None)
+            if future is None or future.done():
+                continue
+            if "error" in message:
+                future.set_exception(RuntimeError(message["error"]))
+            else:
+                future.set_result(message["image"])
+
+        # 连接断开，未完成的请求全部失败
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(ConnectionError("渲染服务连接已断开"))
+        self._futures.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻渲染服务")
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="监听地址，只接受本机回环地址"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-queue", type=int, default=64)
+    args = parser.parse_args()
+
+    try:
+        server = RenderServer(args.host, args.port, args.workers, args.max_queue)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
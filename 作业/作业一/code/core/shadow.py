@@ -0,0 +1,84 @@
+"""
+阴影贴图模块
+使用仅深度模式从光源视角渲染深度，并提供向量化的阴影查询
+"""
+
+import numpy as np
+
+from .rasterizer import Rasterization
+
+
+class ShadowMap:
+    """软件阴影贴图"""
+
+    def __init__(self, width, height=None, bias=0.01, pcf_radius=1):
+        """
+        Args:
+            width: 阴影贴图宽度
+            height: 阴影贴图高度，默认与宽度相同
+            bias: 深度偏移，避免自遮挡产生的阴影失真（shadow acne）
+            pcf_radius: PCF 半径（单位为纹素），0 表示不做 PCF
+        """
+        self.width = width
+        self.height = width if height is None else height
+        self.bias = bias
+        self.pcf_radius = pcf_radius
+
+        # 仅深度 + 深度测试：只保留离光源最近的深度
+        self.rasterizer = Rasterization(self.width, self.height)
+        self.rasterizer.enableDepthOnly(True)
+        self.rasterizer.enableDepthTest(True)
+
+    @property
+    def depth(self) -> np.ndarray:
+        """光源视角下的深度缓冲"""
+        return self.rasterizer.depth_buf
+
+    def setViewM(self, mat):
+        """设置光源的视图矩阵（通常由 LookAt 构建）"""
+        self.rasterizer.setViewM(mat)
+
+    def setProjM(self, mat):
+        """设置光源的投影矩阵（平行光通常用 Ortho）"""
+        self.rasterizer.setProjM(mat)
+
+    def render(self, t_list):
+        """从光源视角渲染阴影投射体，结果保留到下次调用，可重复使用"""
+        self.rasterizer.render(t_list)
+
+    def lookup(self, points: np.ndarray) -> np.ndarray:
+        """
+        查询一组世界坐标点的可见度
+
+        Args:
+            points: (N, 3) 世界坐标
+        Returns:
+            (N,) 可见度，1 表示完全受光，0 表示完全在阴影中
+        """
+        n = len(points)
+        light_m = self.rasterizer.proj_m @ self.rasterizer.view_m
+
+        # 变换到光源的屏幕空间，与 Rasterization.rasterize_triangle 一致
+        v4 = np.hstack((points, np.ones((n, 1)))) @ light_m.T
+        v4 = v4[:, :3] / v4[:, 3:4]
+        sx = (v4[:, 0] * 0.5 + 0.5) * self.width
+        sy = (1.0 - (v4[:, 1] * 0.5 + 0.5)) * self.height
+        ref = v4[:, 2] - self.bias
+
+        # PCF 采样偏移，(2r+1)^2 个纹素
+        r = max(0, int(self.pcf_radius))
+        offsets = np.arange(-r, r + 1)
+        ox, oy = np.meshgrid(offsets, offsets)
+        ox, oy = ox.ravel(), oy.ravel()
+
+        tx = np.floor(sx).astype(np.int64)[:, None] + ox[None, :]
+        ty = np.floor(sy).astype(np.int64)[:, None] + oy[None, :]
+
+        # 阴影贴图范围外视为受光
+        valid = (tx >= 0) & (tx < self.width) & (ty >= 0) & (ty < self.height)
+        stored = self.depth[
+            np.clip(ty, 0, self.height - 1), np.clip(tx, 0, self.width - 1)
+        ]
+        lit = ~valid | (ref[:, None] <= stored)
+
+        return lit.mean(axis=1)
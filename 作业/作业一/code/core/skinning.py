@@ -0,0 +1,259 @@
+"""
+蒙皮模块
+对带骨骼权重的索引网格做线性混合蒙皮（LBS）和对偶四元数蒙皮（DQS），
+所有顶点一次性以 NumPy 批量计算，结果交给光栅化器的变换阶段
+
+骨骼变换可以用两种形式给出:
+    (B, 4, 4) 矩阵
+    (rotations, translations) 元组：rotations 为 (B, 4) 的 (w, x, y, z) 单位四元数
+    或 Quaternion 列表，translations 为 (B, 3)，省略时为 0
+变换应已包含绑定姿势的逆矩阵，即把绑定姿势下的顶点直接变换到当前姿势。
+"""
+
+import numpy as np
+
+from .math_utils import Quaternion
+from .scene import Scene
+
+
+def quaternions_to_matrices(q: np.ndarray) -> np.ndarray:
+    """(B, 4) 的 (w, x, y, z) 四元数批量转换为 (B, 3, 3) 旋转矩阵，同 Quaternion.to_rotation_matrix"""
+    q = q / np.linalg.norm(q, axis=1, keepdims=True)
+    a, b, c, d = q.T
+    return np.stack(
+        [
+            np.stack(
+                [a**2 + b**2 - c**2 - d**2, 2 * (b * c - a * d), 2 * (b * d + a * c)],
+                -1,
+            ),
+            np.stack(
+                [2 * (b * c + a * d), a**2 - b**2 + c**2 - d**2, 2 * (c * d - a * b)],
+                -1,
+            ),
+            np.stack(
+                [2 * (b * d - a * c), 2 * (c * d + a * b), a**2 - b**2 - c**2 + d**2],
+                -1,
+            ),
+        ],
+        axis=1,
+    )
+
+
+def matrices_to_quaternions(r: np.ndarray) -> np.ndarray:
+    """
+    (B, 3, 3) 旋转矩阵批量转换为 (B, 4) 的 (w, x, y, z) 单位四元数
+
+    按 w、x、y、z 中绝对值最大的分量选择公式，避免除以接近 0 的数。
+    """
+    m00, m11, m22 = r[:, 0, 0], r[:, 1, 1], r[:, 2, 2]
+    # 4 倍各分量的平方
+    sq = np.stack(
+        [
+            1 + m00 + m11 + m22,
+            1 + m00 - m11 - m22,
+            1 - m00 + m11 - m22,
+            1 - m00 - m11 + m22,
+        ],
+        axis=1,
+    )
+    zy = r[:, 2, 1] - r[:, 1, 2]
+    xz = r[:, 0, 2] - r[:, 2, 0]
+    yx = r[:, 1, 0] - r[:, 0, 1]
+    xy = r[:, 1, 0] + r[:, 0, 1]
+    xz_ = r[:, 0, 2] + r[:, 2, 0]
+    yz = r[:, 2, 1] + r[:, 1, 2]
+
+    # 第 k 行：以第 k 个分量最大时，4 * q_k * (w, x, y, z)
+    candidates = np.stack(
+        [
+            np.stack([sq[:, 0], zy, xz, yx], -1),
+            np.stack([zy, sq[:, 1], xy, xz_], -1),
+            np.stack([xz, xy, sq[:, 2], yz], -1),
+            np.stack([yx, xz_, yz, sq[:, 3]], -1),
+        ],
+        axis=1,
+    )
+    best = np.argmax(sq, axis=1)
+    q = candidates[np.arange(len(r)), best]
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def _split_bones(bones):
+    """把骨骼变换统一为 (rotations, translations, matrices)，其中只有需要的形式被计算"""
+    if isinstance(bones, tuple):
+        rotations, translations = bones
+        if len(rotations) and isinstance(rotations[0], Quaternion):
+            rotations = [[q.w, q.x, q.y, q.z] for q in rotations]
+        rotations = np.asarray(rotations, dtype=np.float64)
+        if translations is None:
+            translations = np.zeros((len(rotations), 3))
+        return rotations, np.asarray(translations, dtype=np.float64), None
+
+    matrices = np.asarray(bones, dtype=np.float64)
+    return None, None, matrices
+
+
+def bone_matrices(bones) -> np.ndarray:
+    """骨骼变换的 (B, 4, 4) 矩阵形式"""
+    rotations, translations, matrices = _split_bones(bones)
+    if matrices is None:
+        matrices = np.tile(np.eye(4), (len(rotations), 1, 1))
+        matrices[:, :3, :3] = quaternions_to_matrices(rotations)
+        matrices[:, :3, 3] = translations
+    return matrices
+
+
+def bone_dual_quaternions(bones) -> tuple[np.ndarray, np.ndarray]:
+    """
+    骨骼变换的对偶四元数形式
+
+    Returns:
+        real: (B, 4) 旋转部分
+        dual: (B, 4) 平移部分，等于 0.5 * (0, t) * real
+    """
+    rotations, translations, matrices = _split_bones(bones)
+    if rotations is None:
+        rotations = matrices_to_quaternions(matrices[:, :3, :3])
+        translations = matrices[:, :3, 3]
+    real = rotations / np.linalg.norm(rotations, axis=1, keepdims=True)
+
+    # (0, t) * (w, v) = (-t·v, w t + t × v)
+    w, v = real[:, :1], real[:, 1:]
+    dual = 0.5 * np.hstack(
+        (
+            -np.sum(translations * v, axis=1, keepdims=True),
+            w * translations + np.cross(translations, v),
+        )
+    )
+    return real, dual
+
+
+def _normalize_rows(n: np.ndarray) -> np.ndarray:
+    length = np.linalg.norm(n, axis=1, keepdims=True)
+    return n / np.where(length > 1e-12, length, 1.0)
+
+
+def linear_blend_skinning(vertices, bone_indices, bone_weights, bones, normals=None):
+    """
+    线性混合蒙皮
+
+    Args:
+        vertices: (V, 3) 绑定姿势下的顶点
+        bone_indices: (V, K) 每个顶点受影响的骨骼编号
+        bone_weights: (V, K) 对应的权重，每行之和应为 1
+        bones: 骨骼变换，形式见模块说明
+        normals: (V, 3) 法线，可选
+    Returns:
+        (vertices, normals)，未给出法线时 normals 为 None
+    """
+    matrices = bone_matrices(bones)[:, :3, :]
+
+    # 对每个顶点混合 3x4 矩阵；K 通常不超过 4，按影响槽位循环，
+    # 每次只产生 (V, 3, 4) 的临时数组
+    blended = np.zeros((len(vertices), 3, 4))
+    for k in range(bone_indices.shape[1]):
+        blended += bone_weights[:, k, None, None] * matrices[bone_indices[:, k]]
+
+    out = np.einsum("vij,vj->vi", blended[:, :, :3], vertices) + blended[:, :, 3]
+    if normals is None:
+        return out, None
+    # 假设骨骼变换不含非均匀缩放，法线直接用混合后的线性部分变换
+    return out, _normalize_rows(np.einsum("vij,vj->vi", blended[:, :, :3], normals))
+
+
+def dual_quaternion_skinning(vertices, bone_indices, bone_weights, bones, normals=None):
+    """
+    对偶四元数蒙皮
+
+    与线性混合蒙皮参数相同。混合的是对偶四元数而不是矩阵，
+    关节大角度弯曲时不会出现体积塌缩（"糖纸"效应）。
+    """
+    real, dual = bone_dual_quaternions(bones)
+
+    # 与第一个影响骨骼的四元数同向，保证沿最短路径混合
+    pivot = real[bone_indices[:, 0]]
+    blend_real = np.zeros((len(vertices), 4))
+    blend_dual = np.zeros((len(vertices), 4))
+    for k in range(bone_indices.shape[1]):
+        r = real[bone_indices[:, k]]
+        w = bone_weights[:, k] * np.where(np.sum(r * pivot, axis=1) < 0, -1.0, 1.0)
+        blend_real += w[:, None] * r
+        blend_dual += w[:, None] * dual[bone_indices[:, k]]
+
+    norm = np.linalg.norm(blend_real, axis=1, keepdims=True)
+    blend_real /= norm
+    blend_dual /= norm
+
+    w_r, q_r = blend_real[:, :1], blend_real[:, 1:]
+    w_d, q_d = blend_dual[:, :1], blend_dual[:, 1:]
+
+    def rotate(p):
+        return p + 2 * np.cross(q_r, np.cross(q_r, p) + w_r * p)
+
+    # 平移 t = 2 * (dual * conj(real)) 的向量部分
+    translation = 2 * (w_r * q_d - w_d * q_r + np.cross(q_r, q_d))
+    out = rotate(vertices) + translation
+    if normals is None:
+        return out, None
+    return out, _normalize_rows(rotate(normals))
+
+
+class SkinnedMesh:
+    """带骨骼权重的索引网格"""
+
+    def __init__(
+        self, vertices, indices, bone_indices, bone_weights, colors=None, normals=None
+    ):
+        """
+        Args:
+            vertices: (V, 3) 绑定姿势下的顶点
+            indices: (F, 3) 三角形的顶点索引
+            bone_indices: (V, K) 每个顶点受影响的骨骼编号
+            bone_weights: (V, K) 对应的权重，会被归一化为每行之和为 1
+            colors: (V, 3) 顶点颜色，可选
+            normals: (V, 3) 顶点法线，可选
+        """
+        self.vertices = np.asarray(vertices, dtype=np.float64)
+        self.indices = np.asarray(indices)
+        self.bone_indices = np.asarray(bone_indices, dtype=np.intp)
+        weights = np.asarray(bone_weights, dtype=np.float64)
+        total = weights.sum(axis=1, keepdims=True)
+        self.bone_weights = weights / np.where(total > 0, total, 1.0)
+        self.colors = colors
+        self.normals = normals
+
+    def skin(self, bones, method="linear"):
+        """
+        计算当前姿势下的顶点和法线
+
+        Args:
+            bones: 骨骼变换，形式见模块说明
+            method: "linear" 线性混合蒙皮，"dual_quaternion" 对偶四元数蒙皮
+        """
+        if method == "linear":
+            skinning = linear_blend_skinning
+        elif method == "dual_quaternion":
+            skinning = dual_quaternion_skinning
+        else:
+            raise ValueError(f"未知的蒙皮方法: {method}")
+        return skinning(
+            self.vertices, self.bone_indices, self.bone_weights, bones, self.normals
+        )
+
+    def pose(self, bones, method="linear", view_m=None, proj_m=None) -> Scene:
+        """
+        返回当前姿势下的场景，可直接用 Scene.render 交给光栅化器
+
+        Args:
+            bones, method: 见 skin
+            view_m, proj_m: 相机矩阵，可选
+        """
+        vertices, normals = self.skin(bones, method)
+        return Scene(
+            vertices,
+            self.colors,
+            normals,
+            self.indices,
+            view_m=view_m,
+            proj_m=proj_m,
+        )
@@ -1,17 +1,31 @@
 """
 示例模块
+
+各示例在首次访问时才导入（PEP 562），运行单个示例不必加载其他示例。
 """
 
-from .basic_rendering import basic_triangle_example
-from .projection_demo import projection_comparison_example
-from .antialiasing_demo import antialiasing_comparison_example
-from .depth_test_demo import depth_test_example
-from .rotation_demo import rotation_interpolation_example
-
-__all__ = [
-    "basic_triangle_example",
-    "projection_comparison_example",
-    "antialiasing_comparison_example",
-    "depth_test_example",
-    "rotation_interpolation_example",
-]
+import importlib
+
+# 名称 -> 所在子模块
+_EXPORTS = {
+    "basic_triangle_example": ".basic_rendering",
+    "projection_comparison_example": ".projection_demo",
+    "antialiasing_comparison_example": ".antialiasing_demo",
+    "depth_test_example": ".depth_test_demo",
+    "rotation_interpolation_example": ".rotation_demo",
+    "shadow_example": ".shadow_demo",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value  # 之后的访问不再经过 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
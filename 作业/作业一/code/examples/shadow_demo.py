@@ -0,0 +1,74 @@
+"""
+阴影贴图示例
+先用仅深度模式从光源视角渲染阴影贴图，再在主渲染中查询阴影
+"""
+
+import numpy as np
+import sys
+import os
+
+# 添加父目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import Triangle, Rasterization, ShadowMap, LookAt, Perspective, Ortho
+
+
+def shadow_example():
+    """阴影贴图示例"""
+    print("=== 阴影贴图 ===")
+
+    triangles = create_shadow_scene()
+
+    # 1. 阴影 pass：从光源视角只渲染深度
+    shadow_map = ShadowMap(256, pcf_radius=1)
+    shadow_map.setViewM(
+        LookAt(np.array([2, 4, 3]), np.array([0, 0, 0]), np.array([0, 1, 0]))
+    )
+    shadow_map.setProjM(Ortho(-3, 3, -3, 3, 0.1, 20.0))
+    shadow_map.render(triangles)
+
+    # 2. 主 pass：正常渲染并查询阴影
+    renderer = Rasterization(512, 512)
+    renderer.setViewM(
+        LookAt(np.array([0, 2, 5]), np.array([0, 0, 0]), np.array([0, 1, 0]))
+    )
+    renderer.setProjM(Perspective(45, 1.0, 0.1, 50.0))
+    renderer.enableDepthTest(True)
+    renderer.setShadowMap(shadow_map, strength=0.6)
+
+    renderer.render(triangles)
+    renderer.save_image("shadow_map.png")
+
+    print("阴影贴图完成")
+
+
+def create_shadow_scene():
+    """创建一个地面和一个悬空的三角形"""
+    triangles = []
+
+    # 地面（灰色，两个三角形组成的正方形，y=-1）
+    for a, b, c in (
+        ((-2, -1, -2), (-2, -1, 2), (2, -1, 2)),
+        ((-2, -1, -2), (2, -1, 2), (2, -1, -2)),
+    ):
+        t = Triangle()
+        for i, v in enumerate((a, b, c)):
+            t.setVertex(i, *v)
+            t.setColor(i, 0.8, 0.8, 0.8)
+        triangles.append(t)
+
+    # 悬空三角形（彩色，投下阴影）
+    t = Triangle()
+    t.setVertex(0, 0, 0.8, 0)
+    t.setVertex(1, -0.8, 0, 0.3)
+    t.setVertex(2, 0.8, 0, -0.3)
+    t.setColor(0, 1.0, 0.0, 0.0)  # 红色
+    t.setColor(1, 0.0, 1.0, 0.0)  # 绿色
+    t.setColor(2, 0.0, 0.0, 1.0)  # 蓝色
+    triangles.append(t)
+
+    return triangles
+
+
+if __name__ == "__main__":
+    shadow_example()
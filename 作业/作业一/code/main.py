@@ -1,58 +1,108 @@
 """
 主程序入口
-运行所有示例
+运行所有示例，或按名称选择示例:
+
+    python main.py                      # 运行所有示例
+    python main.py basic shadow         # 只运行指定的示例
+    python main.py --jobs 1             # 在当前进程中依次运行
+    python main.py --list               # 列出可用的示例
 """
 
+import argparse
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from clean import clean_all
-from examples import (
-    basic_triangle_example,
-    projection_comparison_example,
-    antialiasing_comparison_example,
-    depth_test_example,
-    rotation_interpolation_example,
-)
 
 CLEAN = False
 
+# 名称 -> (示例函数, 说明, 预计耗时（秒），用于调度)
+EXAMPLES = {
+    "basic": ("basic_triangle_example", "基础渲染", 2.1),
+    "projection": ("projection_comparison_example", "投影对比", 0.4),
+    "rotation": ("rotation_interpolation_example", "旋转插值", 0.5),
+    "depth": ("depth_test_example", "深度测试", 1.7),
+    "antialiasing": ("antialiasing_comparison_example", "抗锯齿对比（重点）", 6.4),
+    "shadow": ("shadow_example", "阴影贴图", 2.2),
+}
+
+
+def run_example(name):
+    """运行一个示例，返回 (名称, 耗时)；只导入该示例用到的模块"""
+    import examples
+
+    t0 = time.perf_counter()
+    getattr(examples, EXAMPLES[name][0])()
+    return name, time.perf_counter() - t0
+
+
+def run_examples(names, jobs=None):
+    """
+    运行一组示例
+
+    Args:
+        names: 示例名称列表
+        jobs: 并行进程数，默认等于 CPU 核数；为 1 时在当前进程中依次运行
+    Returns:
+        {名称: 耗时}
+    """
+    jobs = min(jobs or os.cpu_count() or 1, len(names))
+    timings = {}
+
+    if jobs <= 1:
+        for name in names:
+            timings[name] = run_example(name)[1]
+            print()
+        return timings
+
+    # 预计耗时长的先提交，避免最慢的示例最后才开始
+    order = sorted(names, key=lambda name: EXAMPLES[name][2], reverse=True)
+    with ProcessPoolExecutor(jobs) as pool:
+        futures = [pool.submit(run_example, name) for name in order]
+        for future in as_completed(futures):
+            name, seconds = future.result()
+            timings[name] = seconds
+    return timings
+
 
 def main():
     """运行所有示例"""
+    parser = argparse.ArgumentParser(description="计算机图形学作业一：三角形光栅化")
+    parser.add_argument("names", nargs="*", help="要运行的示例，默认全部")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数")
+    parser.add_argument("--list", action="store_true", help="列出可用的示例")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (_, title, _) in EXAMPLES.items():
+            print(f"{name:<14}{title}")
+        return
 
     if CLEAN:
         clean_all()
 
+    names = list(dict.fromkeys(args.names)) or list(EXAMPLES)
+    unknown = [name for name in names if name not in EXAMPLES]
+    if unknown:
+        parser.error(f"未知的示例: {', '.join(unknown)}（可选: {', '.join(EXAMPLES)}）")
+
     print("=" * 50)
     print("计算机图形学作业一：三角形光栅化")
     print("=" * 50)
 
     try:
-        t0 = time.time()
-
-        # 1. 基础渲染
-        basic_triangle_example()
-        print()
-
-        # 2. 投影对比
-        projection_comparison_example()
-        print()
-
-        # 3. 旋转插值
-        rotation_interpolation_example()
-        print()
-
-        # 4. 深度测试
-        depth_test_example()
-        print()
-
-        # 5. 抗锯齿对比（重点）
-        antialiasing_comparison_example()
-        print()
+        t0 = time.perf_counter()
+        timings = run_examples(names, args.jobs)
 
         print("=" * 50)
         print("所有示例已完成！")
         print("=" * 50)
+        print("各示例耗时:")
+        for name in names:
+            print(f"- {name:<14}{timings[name]:6.2f}s  ({EXAMPLES[name][1]})")
+        print()
+
         print("生成的图像文件:")
         print("- perspective_projection.png (透视投影)")
         print("- orthographic_projection.png (正交投影)")
@@ -62,9 +112,10 @@ def main():
         print("- depth_test.png (深度测试)")
         print("- thin_triangles_aliasing.png (走样效果) ")
         print("- thin_triangles_antialiasing.png (反走样效果)")
+        print("- shadow_map.png (阴影贴图)")
         print()
 
-        print(f"运行耗时: {time.time() - t0:.2f}s")
+        print(f"运行耗时: {time.perf_counter() - t0:.2f}s")
         print()
 
     except Exception as e:
@@ -12,6 +12,7 @@ class Camera:
         self.aspect = 16.0 / 9.0
         self.near = 0.1
         self.far = 10000.0
+        self.move_speed = 6.25  # 每秒移动的距离，相当于原来每 16 ms 移动 0.1
 
         # 是否正在移动
         self.moving_forward = False
@@ -30,20 +31,31 @@ class Camera:
     def set_aspect(self, aspect):
         self.aspect = aspect
 
+    def is_moving(self):
+        return (
+            self.moving_forward
+            or self.moving_backward
+            or self.moving_left
+            or self.moving_right
+            or self.moving_up
+            or self.moving_down
+        )
+
     # 新增：相机移动
-    def tick(self):
+    def tick(self, delta_time=0.016):
+        distance = self.move_speed * delta_time
         if self.moving_forward:
-            self.move_forward()
+            self.move_forward(distance)
         if self.moving_backward:
-            self.move_backward()
+            self.move_backward(distance)
         if self.moving_left:
-            self.move_left()
+            self.move_left(distance)
         if self.moving_right:
-            self.move_right()
+            self.move_right(distance)
         if self.moving_up:
-            self.move_up()
+            self.move_up(distance)
         if self.moving_down:
-            self.move_down()
+            self.move_down(distance)
 
     def move_forward(self, distance=0.1):
         phi = self._get_phi()
@@ -1,78 +1,301 @@
+import hashlib
+import os
+
 import numpy as np
 
+# 所有生成器返回 (vertices, indices)：
+#     vertices: (N, 9) float32，每行为 x, y, z, w, u, v, nx, ny, nz
+#     indices: (M,) uint32，每 3 个组成一个三角形
+# 三角形的环绕方向与原有的球面一致：从法线一侧看为顺时针
+
+GEOMETRY_CACHE_DIR = ".geometry_cache"
+_CACHE_VERSION = 2  # 生成算法变化时加 1，使旧缓存失效
+
 
-def create_sphere(radius=1.0, slices=64, stacks=32):
+def _pack(positions, texcoords, normals):
+    """把各属性拼成 (N, 9) 的顶点数组，w 分量补 1"""
+    n = len(positions)
+    vertices = np.empty((n, 9), dtype=np.float32)
+    vertices[:, 0:3] = positions
+    vertices[:, 3] = 1.0
+    vertices[:, 4:6] = texcoords
+    vertices[:, 6:9] = normals
+    return vertices
+
+
+def _grid_indices(rows, cols):
     """
-    生成球面三角化数据
-    返回: positions, texcoords, normals
+    (rows + 1) x (cols + 1) 个顶点组成的网格的三角形索引
+
+    每个格子拆成 (first, second, first + 1) 和 (second, second + 1, first + 1)，
+    first 为格子左上角，second 为其下一行的顶点
     """
-    vertices = []
+    first = (
+        np.arange(rows, dtype=np.uint32)[:, None, None] * (cols + 1)
+        + np.arange(cols, dtype=np.uint32)[None, :, None]
+    )
+    corners = np.array([0, cols + 1, 1, cols + 1, cols + 2, 1], dtype=np.uint32)
+    return (first + corners).ravel()
+
+
+def sphere_mesh(radius=1.0, slices=64, stacks=32):
+    """UV 球面，经线方向 slices 段，纬线方向 stacks 段"""
+    i = np.arange(stacks + 1)
+    j = np.arange(slices + 1)
+    theta = i * np.pi / stacks
+    phi = j * 2 * np.pi / slices
+    sin_theta = np.sin(theta)[:, None]
+    cos_theta = np.cos(theta)[:, None]
+    sin_phi = np.sin(phi)[None, :]
+    cos_phi = np.cos(phi)[None, :]
 
-    for i in range(stacks + 1):  # i = 0..stacks
-        theta = i * np.pi / stacks
-        sin_theta = np.sin(theta)
-        cos_theta = np.cos(theta)
+    # 直接按 (stacks + 1, slices + 1, 9) 填写，行列分别广播，不生成中间的二维网格
+    vertices = np.empty((stacks + 1, slices + 1, 9), dtype=np.float32)
+    vertices[..., 0] = radius * sin_theta * cos_phi
+    vertices[..., 1] = radius * cos_theta
+    vertices[..., 2] = radius * sin_theta * sin_phi
+    vertices[..., 3] = 1.0
+    vertices[..., 4] = (1 - j / slices)[None, :]
+    vertices[..., 5] = (1 - i / stacks)[:, None]
+    vertices[..., 6] = sin_theta * cos_phi
+    vertices[..., 7] = cos_theta
+    vertices[..., 8] = sin_theta * sin_phi
+    return vertices.reshape(-1, 9), _grid_indices(stacks, slices)
 
-        for j in range(slices + 1):  # j = 0..slices
-            phi = j * 2 * np.pi / slices
-            sin_phi = np.sin(phi)
-            cos_phi = np.cos(phi)
 
-            x = radius * sin_theta * cos_phi
-            y = radius * cos_theta
-            z = radius * sin_theta * sin_phi
+def plane_mesh(size=5.0, divisions=1, uv_scale=5.0):
+    """y = 0 上边长 2 * size 的正方形，法线朝 +y，纹理坐标重复 uv_scale 次"""
+    i, j = np.meshgrid(
+        np.arange(divisions + 1), np.arange(divisions + 1), indexing="ij"
+    )
+    s = (j / divisions).ravel()
+    t = (i / divisions).ravel()
+
+    positions = np.stack(
+        [size * (2 * s - 1), np.zeros_like(s), size * (2 * t - 1)], axis=1
+    )
+    texcoords = np.stack([uv_scale * s, uv_scale * t], axis=1)
+    normals = np.tile([0.0, 1.0, 0.0], (len(s), 1))
+    vertices = _pack(positions, texcoords, normals)
 
-            u = 1 - j / slices
-            v = 1 - i / stacks
+    # 格子按 (first, first + 1, second + 1) 和 (first, second + 1, second) 拆分
+    first = (i[:-1, :-1] * (divisions + 1) + j[:-1, :-1]).ravel()
+    second = first + divisions + 1
+    indices = np.stack(
+        [first, first + 1, second + 1, first, second + 1, second], axis=1
+    )
+    return vertices, indices.ravel().astype(np.uint32)
 
-            nx = sin_theta * cos_phi
-            ny = cos_theta
-            nz = sin_theta * sin_phi
 
-            # fmt: off
-            vertices.append([x, y, z, 1.0,     u, v,     nx, ny, nz])
-            # fmt: on
+def _spherical_texcoords(normals):
+    """与 UV 球面相同的经纬度纹理坐标"""
+    phi = np.arctan2(normals[:, 2], normals[:, 0]) % (2 * np.pi)
+    theta = np.arccos(np.clip(normals[:, 1], -1.0, 1.0))
+    return np.stack([1 - phi / (2 * np.pi), 1 - theta / np.pi], axis=1)
 
-    vertices = np.array(vertices, dtype=np.float32)
 
-    indices = []
-    for i in range(stacks):
-        for j in range(slices):
-            first = i * (slices + 1) + j
-            second = first + slices + 1
+def _split_seam(vertices, faces):
+    """
+    修正经纬度纹理坐标在接缝和两极处的三角形
 
-            indices.extend([first, second, first + 1])
-            indices.extend([second, second + 1, first + 1])
+    跨过接缝（u 从 1 跳回 0）的三角形，把 u 较小一侧的顶点复制一份并令 u + 1，
+    纹理重复平铺时与接缝另一侧连续；两极的经度不确定，每个含极点的三角形
+    各用一个极点副本，u 取另外两个顶点的平均值
+    """
+    faces = faces.copy()
+    u = vertices[:, 4]
+    pole = np.abs(vertices[:, 7]) > 1 - 1e-6
 
-    indices = np.array(indices, dtype=np.uint32)
-    indexed_vertices = vertices[indices]
+    # 接缝：只看非极点顶点的 u 跨度
+    face_u = u[faces]
+    face_pole = pole[faces]
+    span = np.where(face_pole, -np.inf, face_u).max(axis=1) - np.where(
+        face_pole, np.inf, face_u
+    ).min(axis=1)
+    shift = (span > 0.5)[:, None] & ~face_pole & (face_u < 0.5)
+    ids, inverse = np.unique(faces[shift], return_inverse=True)
+    shifted = vertices[ids]
+    shifted[:, 4] += 1
+    faces[shift] = len(vertices) + inverse
+    vertices = np.concatenate([vertices, shifted])
 
-    positions = indexed_vertices[:, 0:4]
-    texcoords = indexed_vertices[:, 4:6]
-    normals = indexed_vertices[:, 6:9]
+    # 极点：每个三角形一个副本
+    f, c = np.nonzero(face_pole)
+    poles = vertices[faces[f, c]]
+    others_u = vertices[faces[f], 4]
+    poles[:, 4] = (others_u.sum(axis=1) - others_u[np.arange(len(f)), c]) / 2
+    faces[f, c] = len(vertices) + np.arange(len(f))
+    vertices = np.concatenate([vertices, poles])
+    return vertices, faces
 
-    return positions, texcoords, normals
 
+def icosphere_mesh(radius=1.0, subdivisions=3):
+    """
+    由正二十面体细分得到的球面，三角形大小均匀，没有两极的细长三角形
 
-def create_plane(size=5.0):
-    """生成地面平面"""
+    每次细分把每个三角形按边中点分成 4 个，共享边的中点只生成一次；
+    接缝和两极的顶点按 _split_seam 复制（subdivisions 为 0 时两极落在边上，
+    极点附近的纹理仍会扭曲）
+    """
+    t = (1 + np.sqrt(5)) / 2
     # fmt: off
-    # 防止我们精心设置的空格被 black 格式化掉
-    vertices = np.array(
+    positions = np.array(
+        [
+            [-1,  t,  0], [ 1,  t,  0], [-1, -t,  0], [ 1, -t,  0],
+            [ 0, -1,  t], [ 0,  1,  t], [ 0, -1, -t], [ 0,  1, -t],
+            [ t,  0, -1], [ t,  0,  1], [-t,  0, -1], [-t,  0,  1],
+        ],
+        dtype=np.float64,
+    )
+    faces = np.array(
         [
-            [-size, 0.0, -size, 1.0,     0.0, 0.0,     0.0, 1.0, 0.0],
-            [ size, 0.0, -size, 1.0,     5.0, 0.0,     0.0, 1.0, 0.0],
-            [ size, 0.0,  size, 1.0,     5.0, 5.0,     0.0, 1.0, 0.0],
-            [-size, 0.0, -size, 1.0,     0.0, 0.0,     0.0, 1.0, 0.0],
-            [ size, 0.0,  size, 1.0,     5.0, 5.0,     0.0, 1.0, 0.0],
-            [-size, 0.0,  size, 1.0,     0.0, 5.0,     0.0, 1.0, 0.0],
+            [0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+            [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+            [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+            [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1],
         ],
-        dtype=np.float32,
+        dtype=np.int64,
     )
     # fmt: on
+    positions /= np.linalg.norm(positions, axis=1, keepdims=True)
+
+    for _ in range(subdivisions):
+        # 三条边 (a, b)、(b, c)、(c, a)，无向边去重后每条边一个中点
+        edges = np.stack([faces, np.roll(faces, -1, axis=1)], axis=2).reshape(-1, 2)
+        edges.sort(axis=1)
+        unique_edges, edge_ids = np.unique(edges, axis=0, return_inverse=True)
+        midpoints = positions[unique_edges].sum(axis=1)
+        midpoints /= np.linalg.norm(midpoints, axis=1, keepdims=True)
+
+        mid = (edge_ids.reshape(-1, 3) + len(positions)).astype(np.int64)
+        a, b, c = faces.T
+        ab, bc, ca = mid.T
+        faces = np.concatenate(
+            [
+                np.stack([a, ab, ca], axis=1),
+                np.stack([b, bc, ab], axis=1),
+                np.stack([c, ca, bc], axis=1),
+                np.stack([ab, bc, ca], axis=1),
+            ]
+        )
+        positions = np.concatenate([positions, midpoints])
+
+    vertices = _pack(radius * positions, _spherical_texcoords(positions), positions)
+    vertices, faces = _split_seam(vertices, faces[:, ::-1])
+    return vertices, faces.ravel().astype(np.uint32)
+
+
+def cube_mesh(size=1.0):
+    """中心在原点、边长 2 * size 的立方体，每个面 4 个顶点，法线垂直于面"""
+    # 每个面的法线和面内的两个方向（u 方向、v 方向），u × v = 法线
+    # fmt: off
+    axes = np.array(
+        [
+            [[ 1, 0,  0], [ 0, 0, -1], [0, 1,  0]],
+            [[-1, 0,  0], [ 0, 0,  1], [0, 1,  0]],
+            [[ 0, 1,  0], [ 1, 0,  0], [0, 0, -1]],
+            [[ 0, -1, 0], [ 1, 0,  0], [0, 0,  1]],
+            [[ 0, 0,  1], [ 1, 0,  0], [0, 1,  0]],
+            [[ 0, 0, -1], [-1, 0,  0], [0, 1,  0]],
+        ],
+        dtype=np.float64,
+    )
+    # fmt: on
+    corners = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float64)
+
+    normal = axes[:, None, 0]
+    u_dir = axes[:, None, 1]
+    v_dir = axes[:, None, 2]
+    s = corners[None, :, 0:1]
+    t = corners[None, :, 1:2]
+    positions = size * (normal + (2 * s - 1) * u_dir + (2 * t - 1) * v_dir)
+
+    vertices = _pack(
+        positions.reshape(-1, 3),
+        np.tile(corners, (6, 1)),
+        np.repeat(axes[:, 0], 4, axis=0),
+    )
+    base = np.arange(6)[:, None] * 4
+    indices = base + np.array([0, 2, 1, 0, 3, 2])
+    return vertices, indices.ravel().astype(np.uint32)
+
+
+def cylinder_mesh(radius=1.0, height=2.0, slices=64, caps=True):
+    """轴沿 y 方向、中心在原点的圆柱，caps 为 True 时带上下底面"""
+    j = np.arange(slices + 1)
+    phi = j * 2 * np.pi / slices
+    ring = np.stack([np.cos(phi), np.zeros_like(phi), np.sin(phi)], axis=1)
+    half = height / 2
+
+    # 侧面：上下两圈顶点，与 UV 球面的经线方向一致
+    side_normals = np.concatenate([ring, ring])
+    side_positions = radius * side_normals
+    side_positions[: slices + 1, 1] = half
+    side_positions[slices + 1 :, 1] = -half
+    side_texcoords = np.stack(
+        [np.tile(1 - j / slices, 2), np.repeat([1.0, 0.0], slices + 1)], axis=1
+    )
+    parts = [_pack(side_positions, side_texcoords, side_normals)]
+    indices = [_grid_indices(1, slices)]
+
+    if caps:
+        offset = 2 * (slices + 1)
+        for y, sign in ((half, 1.0), (-half, -1.0)):
+            # 中心点 + 一圈边缘点组成三角扇
+            positions = np.concatenate([[[0.0, 0.0, 0.0]], radius * ring])
+            positions[:, 1] = y
+            texcoords = 0.5 + 0.5 * np.concatenate([[[0.0, 0.0]], ring[:, [0, 2]]])
+            normals = np.tile([0.0, sign, 0.0], (slices + 2, 1))
+            parts.append(_pack(positions, texcoords, normals))
+
+            k = np.arange(slices)
+            fan = np.stack([np.zeros(slices, dtype=np.int64), k + 1, k + 2], axis=1)
+            if sign < 0:
+                fan = fan[:, [0, 2, 1]]  # 底面朝下，反转环绕方向
+            indices.append((offset + fan).ravel().astype(np.uint32))
+            offset += slices + 2
+
+    return np.concatenate(parts), np.concatenate(indices)
+
+
+GENERATORS = {
+    "sphere": sphere_mesh,
+    "plane": plane_mesh,
+    "icosphere": icosphere_mesh,
+    "cube": cube_mesh,
+    "cylinder": cylinder_mesh,
+}
+
+
+def load_mesh(kind, cache_dir=GEOMETRY_CACHE_DIR, **params):
+    """
+    生成网格，结果按 生成器名称 + 参数 缓存到磁盘
+
+    Args:
+        kind: GENERATORS 中的名称
+        cache_dir: 缓存目录，为 None 时不使用缓存
+        **params: 传给生成器的参数
+    Returns:
+        (vertices, indices)
+    """
+    generator = GENERATORS[kind]
+    if cache_dir is None:
+        return generator(**params)
 
-    positions = vertices[:, 0:4]
-    texcoords = vertices[:, 4:6]
-    normals = vertices[:, 6:9]
+    key = repr((_CACHE_VERSION, kind, sorted(params.items())))
+    digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+    path = os.path.join(cache_dir, f"{kind}-{digest}.npz")
+    if os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                return data["vertices"], data["indices"]
+        except (OSError, ValueError, KeyError):
+            pass  # 缓存损坏时重新生成
 
-    return positions, texcoords, normals
+    vertices, indices = generator(**params)
+    os.makedirs(cache_dir, exist_ok=True)
+    # 先写临时文件再改名，避免中断时留下不完整的缓存
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, vertices=vertices, indices=indices)
+    os.replace(tmp_path, path)
+    return vertices, indices
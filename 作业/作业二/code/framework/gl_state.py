@@ -0,0 +1,56 @@
+from OpenGL.GL import *
+
+
+class GLState:
+    """
+    GL 绑定状态跟踪
+
+    记住当前的程序、VAO、活动纹理单元和各单元上绑定的纹理与 sampler，与当前状态相同的
+    glUseProgram / glBindVertexArray / glActiveTexture / glBindTexture / glBindSampler 直接跳过。
+    绕过本类直接修改这些状态后，需要调用 invalidate。
+    """
+
+    def __init__(self):
+        self.invalidate()
+
+    def invalidate(self):
+        """忘记所有记录的状态，之后的每次绑定都会真正执行"""
+        self.program = None
+        self.vao = None
+        self.active_unit = None
+        self.textures = {}  # (单元, 目标) -> 纹理
+        self.samplers = {}  # 单元 -> sampler
+
+    def use_program(self, program):
+        """program 为 ShaderProgram、程序 id 或 None（解绑）"""
+        program = 0 if program is None else int(program)
+        if program != self.program:
+            glUseProgram(program)
+            self.program = program
+
+    def bind_vertex_array(self, vao):
+        vao = 0 if vao is None else int(vao)
+        if vao != self.vao:
+            glBindVertexArray(vao)
+            self.vao = vao
+
+    def active_texture(self, unit):
+        """unit 为纹理单元编号（0, 1, 2, ...）"""
+        if unit != self.active_unit:
+            glActiveTexture(GL_TEXTURE0 + unit)
+            self.active_unit = unit
+
+    def bind_texture(self, unit, texture, target=GL_TEXTURE_2D):
+        """把纹理绑定到指定单元，只在需要时切换活动单元"""
+        texture = 0 if texture is None else int(texture)
+        if self.textures.get((unit, target)) != texture:
+            self.active_texture(unit)
+            glBindTexture(target, texture)
+            self.textures[(unit, target)] = texture
+
+    def bind_sampler(self, unit, sampler):
+        """把 sampler 绑定到指定单元，None 或 0 表示使用纹理自身的参数"""
+        sampler = 0 if sampler is None else int(sampler)
+        if self.samplers.get(unit) != sampler:
+            glBindSampler(unit, sampler)
+            self.samplers[unit] = sampler
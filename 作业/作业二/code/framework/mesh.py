@@ -0,0 +1,189 @@
+import ctypes
+
+import numpy as np
+from OpenGL.GL import *
+from pyglm import glm
+
+# 输入为 geometry 中生成器输出的交错顶点: x, y, z, w, u, v, nx, ny, nz
+# 上传前按每个网格选择的格式打包，每个属性按 4 字节对齐:
+#     位置:     "float32" 3 x float32（w 由 GL 补 1）
+#               "int16"   3 x 归一化 int16 + 2 字节填充，配合 dequantize 矩阵还原
+#     法线:     "float32" 3 x float32
+#               "int2_10_10_10" 打包进一个 GL_INT_2_10_10_10_REV
+#     纹理坐标: "float32" 2 x float32
+#               "float16" 2 x 半精度浮点
+#               "unorm16" 2 x 归一化 uint16，只能表示 [0, 1]
+
+POSITION_LOCATION = 0
+TEXCOORD_LOCATION = 1
+NORMAL_LOCATION = 2
+
+# 格式 -> (打包后的 NumPy 字段格式, 分量数, GL 类型, 是否归一化)
+POSITION_FORMATS = {
+    "float32": (("<f4", 3), 3, GL_FLOAT, GL_FALSE),
+    "int16": (("<i2", 4), 3, GL_SHORT, GL_TRUE),
+}
+NORMAL_FORMATS = {
+    "float32": (("<f4", 3), 3, GL_FLOAT, GL_FALSE),
+    "int2_10_10_10": ("<i4", 4, GL_INT_2_10_10_10_REV, GL_TRUE),
+}
+TEXCOORD_FORMATS = {
+    "float32": (("<f4", 2), 2, GL_FLOAT, GL_FALSE),
+    "float16": (("<f2", 2), 2, GL_HALF_FLOAT, GL_FALSE),
+    "unorm16": (("<u2", 2), 2, GL_UNSIGNED_SHORT, GL_TRUE),
+}
+
+
+def _quantize_snorm(values, bits):
+    """[-1, 1] 量化为 bits 位有符号归一化整数，与 GL 的解码方式 max(q / (2^(b-1) - 1), -1) 对应"""
+    scale = (1 << (bits - 1)) - 1
+    return np.round(np.clip(values, -1.0, 1.0) * scale).astype(np.int32)
+
+
+def quantize_positions(positions):
+    """
+    把位置量化为 int16，返回 (量化结果, dequantize 矩阵)
+
+    以包围盒中心为原点、半边长为单位归一化到 [-1, 1]，
+    dequantize = translate(中心) * scale(半边长) 把解码后的值还原到模型空间
+    """
+    lo = positions.min(axis=0)
+    hi = positions.max(axis=0)
+    center = (lo + hi) / 2
+    extent = np.maximum((hi - lo) / 2, np.finfo(np.float32).tiny)
+
+    quantized = _quantize_snorm((positions - center) / extent, 16).astype(np.int16)
+    dequantize = glm.translate(glm.vec3(*center)) * glm.scale(glm.vec3(*extent))
+    return quantized, dequantize
+
+
+def pack_normals_2_10_10_10(normals):
+    """把单位法线打包为 GL_INT_2_10_10_10_REV：x 在低 10 位，依次为 y、z，最高 2 位 w = 0"""
+    q = _quantize_snorm(normals, 10) & 0x3FF
+    packed = q[:, 0] | (q[:, 1] << 10) | (q[:, 2] << 20)
+    return packed.astype(np.uint32).view(np.int32)
+
+
+def pack_vertices(
+    vertices,
+    position_format="float32",
+    normal_format="float32",
+    texcoord_format="float32",
+):
+    """
+    按指定格式打包交错顶点
+
+    Returns:
+        data: 打包后的结构体数组，每个元素为一个顶点
+        attributes: [(属性位置, 分量数, GL 类型, 是否归一化, 字节偏移), ...]
+        dequantize: 位置的还原矩阵，未量化时为单位矩阵
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    formats = [
+        ("position", POSITION_LOCATION, POSITION_FORMATS[position_format]),
+        ("texcoord", TEXCOORD_LOCATION, TEXCOORD_FORMATS[texcoord_format]),
+        ("normal", NORMAL_LOCATION, NORMAL_FORMATS[normal_format]),
+    ]
+    dtype = np.dtype([(name, fmt[0]) for name, _, fmt in formats])
+    data = np.zeros(len(vertices), dtype=dtype)
+
+    positions = vertices[:, 0:3]
+    texcoords = vertices[:, 4:6]
+    normals = vertices[:, 6:9]
+
+    dequantize = glm.mat4(1.0)
+    if position_format == "int16":
+        data["position"][:, :3], dequantize = quantize_positions(positions)
+    else:
+        data["position"] = positions
+
+    if texcoord_format == "unorm16":
+        if texcoords.min() < 0 or texcoords.max() > 1:
+            raise ValueError(
+                "unorm16 纹理坐标只能表示 [0, 1]，重复平铺的纹理请使用 float16"
+            )
+        data["texcoord"] = np.round(texcoords * 65535)
+    else:
+        data["texcoord"] = texcoords
+
+    if normal_format == "int2_10_10_10":
+        data["normal"] = pack_normals_2_10_10_10(normals)
+    else:
+        data["normal"] = normals
+
+    attributes = [
+        (location, fmt[1], fmt[2], fmt[3], dtype.fields[name][1])
+        for name, location, fmt in formats
+    ]
+    return data, attributes, dequantize
+
+
+class Mesh:
+    """
+    索引网格
+
+    去重后的顶点交错存放在一个 VBO 中，三角形索引存放在 EBO 中，用 glDrawElements 绘制。
+    索引不超过 65535 时使用 uint16，否则使用 uint32。
+    顶点属性的存放格式可以按网格选择，见模块开头的说明。
+    """
+
+    def __init__(
+        self,
+        vertices,
+        indices,
+        position_format="float32",
+        normal_format="float32",
+        texcoord_format="float32",
+    ):
+        """
+        Args:
+            vertices: (N, 9) 交错顶点
+            indices: (M,) 三角形索引
+            position_format, normal_format, texcoord_format: 各属性的存放格式
+        """
+        data, attributes, self.dequantize = pack_vertices(
+            vertices, position_format, normal_format, texcoord_format
+        )
+        if len(data) <= np.iinfo(np.uint16).max + 1:
+            indices = np.ascontiguousarray(indices, dtype=np.uint16)
+            self.index_type = GL_UNSIGNED_SHORT
+        else:
+            indices = np.ascontiguousarray(indices, dtype=np.uint32)
+            self.index_type = GL_UNSIGNED_INT
+
+        # 模型空间的包围盒与包围球，用于拟合光源投影
+        positions = np.asarray(vertices, dtype=np.float64)[:, 0:3]
+        lo, hi = positions.min(axis=0), positions.max(axis=0)
+        center = (lo + hi) / 2
+        self.bounding_box = (glm.vec3(*lo), glm.vec3(*hi))
+        self.bounding_center = glm.vec3(*center)
+        self.bounding_radius = float(np.linalg.norm(positions - center, axis=1).max())
+
+        self.vertex_count = len(data)
+        self.index_count = len(indices)
+        self.vertex_bytes = data.nbytes
+
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+
+        # EBO 的绑定记录在 VAO 中，之后绑定 VAO 即可
+        self.ebo = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+
+        stride = data.dtype.itemsize
+        for location, size, gl_type, normalized, offset in attributes:
+            glVertexAttribPointer(
+                location, size, gl_type, normalized, stride, ctypes.c_void_p(offset)
+            )
+            glEnableVertexAttribArray(location)
+
+        glBindVertexArray(0)
+
+    def draw(self):
+        """绘制全部三角形，调用前需绑定 self.vao"""
+        glDrawElements(GL_TRIANGLES, self.index_count, self.index_type, None)
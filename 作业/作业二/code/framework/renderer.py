@@ -1,14 +1,27 @@
+import itertools
+import math
+
+import numpy as np
 from OpenGL.GL import *
-from OpenGL.GL import shaders as gl_shaders
 from pyglm import glm
 
 from .camera import Camera
-from .geometry import create_sphere, create_plane
-from .texture_loader import (
-    load_texture,
-    load_texture_no_filter,
-    load_texture_with_mipmap,
+from .geometry import load_mesh
+from .gl_state import GLState
+from .mesh import Mesh
+from .shader import ProgramCache, ShaderProgram
+from .uniform_buffer import (
+    FRAME_DATA,
+    FRAME_DATA_BINDING,
+    MAX_CASCADES,
+    OBJECT_DATA,
+    OBJECT_DATA_BINDING,
+    UniformBuffer,
 )
+from .texture_loader import TextureManager
+
+# PCF 采样方式，顺序与 task5_shadow.frag 中的 pcfMode 一致
+PCF_MODES = ["hardware", "poisson", "rotated_poisson"]
 
 
 class Renderer:
@@ -19,22 +32,34 @@ class Renderer:
         self.bump_strength = 300.0
         self.use_bump = False
         self.use_shadow = False
+        # 固定的 Poisson 圆盘与原来 21x21 的 PCF 效果最接近；随机旋转会带来逐像素的噪声
+        self.pcf_mode = "poisson"
         self.time = 0.0
 
         self.shaders = {}
+        self.shader_configs = {}
+        self.program_cache = None
+        self._failed_shaders = set()
         self.textures = {}
+        self.texture_manager = None
+        self.samplers = {}
+        self.state = GLState()
+        self.frame_data = None
+        self.object_data = None
 
-        self.sphere_vao = None
-        self.sphere_count = 0
-        self.plane_vao = None
-        self.plane_count = 0
-        self.skybox_vao = None
-        self.skybox_count = 0
+        self.sphere = None
+        self.plane = None
+        self.skybox = None
 
         self.shadow_fbo = None
         self.shadow_map = None
-        self.shadow_width = 2048
-        self.shadow_height = 2048
+        # 光源投影按场景拟合后，1024 的阴影贴图即可达到原来固定投影下 2048 的精度
+        self.shadow_width = 1024
+        self.shadow_height = 1024
+        self.shadow_cascades = 1  # 级联数，1 表示整个场景一张阴影贴图
+        self.shadow_distance = 20.0  # 多级级联时覆盖到的最远距离
+        self.cascade_split_lambda = 0.75  # 级联划分中对数划分所占的比例
+        self._shadow_signature = None  # 上次渲染阴影贴图时的光源与投射物状态
 
         self.window_width = width
         self.window_height = height
@@ -43,6 +68,9 @@ class Renderer:
         # 新增：是否暂停
         self.is_paused = False
 
+        # 画面是否需要重绘；状态改变时置为 True，画完一帧后由窗口置为 False
+        self.needs_redraw = True
+
     def _initialize(self):
         """初始化渲染器"""
         print("初始化渲染器...")
@@ -51,14 +79,18 @@ class Renderer:
         self._load_textures()
         self._create_geometry()
         self._create_shadow_map()
+        self._create_uniform_buffers()
 
         glEnable(GL_DEPTH_TEST)
         glEnable(GL_MULTISAMPLE)
 
+        # 加载纹理、创建 VAO 时直接修改了绑定状态
+        self.state.invalidate()
+
         print("✓ 渲染器初始化完成\n")
 
     def _load_shaders(self):
-        """加载所有着色器"""
+        """登记所有着色器，只编译当前任务用到的，其余在首次需要时再编译"""
         print("  加载着色器...")
 
         shader_configs = [
@@ -73,27 +105,51 @@ class Renderer:
             ("task7", "task3_phong.vert", "task7_plastic_ball.frag"),
             ("shadow_depth", "shadow_depth.vert", "shadow_depth.frag"),
         ]
+        self.shader_configs = {
+            name: (vert_file, frag_file)
+            for name, vert_file, frag_file in shader_configs
+        }
+        self.program_cache = ProgramCache()
+
+        self._prepare_shaders()
+
+    def _required_shaders(self):
+        """当前任务和设置下需要的着色器，按使用顺序排列"""
+        if self.current_task == 3:
+            names = [f"task3_{self.shading_mode}"]
+        else:
+            names = [f"task{self.current_task}"]
+        if self.current_task == 5 or self.use_shadow:
+            names.append("shadow_depth")
+        return names
+
+    def _prepare_shaders(self):
+        """编译当前需要、但还没有编译过的着色器"""
+        for name in self._required_shaders():
+            self._get_shader(name)
+
+    def _get_shader(self, name):
+        """获取着色器程序，第一次使用时编译（或从程序缓存加载）；失败时返回 None"""
+        shader = self.shaders.get(name)
+        if shader is not None or name in self._failed_shaders:
+            return shader
+        if name not in self.shader_configs:
+            return None
+
+        vert_file, frag_file = self.shader_configs[name]
+        try:
+            vert_src = self._load_shader_file(f"shaders/{vert_file}")
+            frag_src = self._load_shader_file(f"shaders/{frag_file}")
+            program, cached = self.program_cache.get_program(vert_src, frag_src)
+        except Exception as e:
+            # 失败的着色器不再重试，避免每帧重复输出错误
+            self._failed_shaders.add(name)
+            print(f"    ✗ {name}: {e.args[0]}")
+            return None
 
-        for name, vert_file, frag_file in shader_configs:
-            try:
-                vert_src = self._load_shader_file(f"shaders/{vert_file}")
-                frag_src = self._load_shader_file(f"shaders/{frag_file}")
-
-                program = gl_shaders.compileProgram(
-                    gl_shaders.compileShader(vert_src, GL_VERTEX_SHADER),
-                    gl_shaders.compileShader(frag_src, GL_FRAGMENT_SHADER),
-                )
-
-                link_status = glGetProgramiv(program, GL_LINK_STATUS)
-                if not link_status:
-                    info_log = glGetProgramInfoLog(program)
-                    print(f"    ✗ {name} 链接失败: {info_log.decode()}")
-                    continue
-
-                self.shaders[name] = program
-                print(f"    ✓ {name}")
-            except Exception as e:
-                print(f"    ✗ {name}: {e.args[0]}")
+        shader = self.shaders[name] = ShaderProgram(program)
+        print(f"    ✓ {name}{' (缓存)' if cached else ''}")
+        return shader
 
     def _load_shader_file(self, path):
         """读取着色器文件"""
@@ -115,135 +171,118 @@ class Renderer:
     #        print(f"    ✓ {name}")
 
     def _load_textures(self):
-        """加载纹理"""
-        print("  加载纹理...")
+        """
+        加载纹理
 
-        # 为 Task1 加载无过滤的纹理（会产生锯齿）
-        try:
-            self.textures["earth_no_filter"] = load_texture_no_filter(
-                "resources/earthmap.jpg"
-            )
-            print(f"    ✓ earth_no_filter (无过滤)")
-        except Exception as e:
-            print(f"    ✗ earth_no_filter: {e}")
+        所有图片先交给后台线程预处理（或读取缓存），随后在主线程逐级上传；
+        Task1 的无过滤效果由 sampler 实现，地球纹理只加载一份
+        """
+        print("  加载纹理...")
 
-        # 为 Task2 加载带 mipmap 的纹理（平滑）
-        try:
-            self.textures["earth"] = load_texture_with_mipmap("resources/earthmap.jpg")
-            print(f"    ✓ earth (带 mipmap)")
-        except Exception as e:
-            print(f"    ✗ earth: {e}")
+        # 名称 -> (路径, 是否为颜色纹理)；高度图是数据，不压缩、不做 sRGB 转换
+        texture_files = {
+            "earth": ("resources/earthmap.jpg", True),
+            "bump": ("resources/earthbump.jpg", False),
+            "plane": ("resources/chessboard.jpg", True),
+            "skybox": ("resources/skybox.jpg", True),
+        }
 
-        # Bump map
-        try:
-            self.textures["bump"] = load_texture("resources/earthbump.jpg")
-            print(f"    ✓ bump")
-        except Exception as e:
-            print(f"    ✗ bump: {e}")
+        self.texture_manager = TextureManager()
+        for name, (path, is_color) in texture_files.items():
+            self.texture_manager.request(name, path, compress=is_color, srgb=is_color)
 
-        # 平面纹理
-        try:
-            self.textures["plane"] = load_texture("resources/chessboard.jpg")
-            print(f"    ✓ plane")
-        except Exception as e:
-            print(f"    ✗ plane: {e}")
+        for name in texture_files:
+            try:
+                self.textures[name] = self.texture_manager.get(name)
+                fmt, nbytes = self.texture_manager.describe(name)
+                print(f"    ✓ {name} ({fmt}, {nbytes / 1024:.0f} KiB)")
+            except Exception as e:
+                self.textures[name] = 0
+                print(f"    ✗ {name}: {e}")
+        # 所有纹理都已上传，不再需要后台线程
+        self.texture_manager.close()
 
-        # 天空盒纹理
-        try:
-            self.textures["skybox"] = load_texture("resources/skybox.jpg")
-            print(f"    ✓ skybox")
-        except Exception as e:
-            print(f"    ✗ skybox: {e}")
+        # 同一张纹理用不同的 sampler 采样
+        self.samplers = {
+            name: self.texture_manager.sampler(name)
+            for name in ("nearest", "trilinear")
+        }
 
     def _create_geometry(self):
-        """创建几何体"""
+        """创建几何体，位置量化为 int16、法线打包为 10-10-10-2，每个顶点 16 字节"""
         print("  创建几何体...")
 
-        # 球体
-        positions, texcoords, normals = create_sphere()
-        self.sphere_count = len(positions)
-        self.sphere_vao = self._create_vao(positions, texcoords, normals)
-        print(f"    ✓ 球体: {self.sphere_count} 顶点")
-
-        # 平面
-        positions, texcoords, normals = create_plane()
-        self.plane_count = len(positions)
-        self.plane_vao = self._create_vao(positions, texcoords, normals)
-        print(f"    ✓ 平面: {self.plane_count} 顶点")
-
-        # 天空盒
-        positions, texcoords, normals = create_sphere(5000)
-        self.skybox_count = len(positions)
-        self.skybox_vao = self._create_vao(positions, texcoords, normals)
-        print(f"    ✓ 天空盒: {self.skybox_count} 顶点")
-
-    def _create_vao(self, positions, texcoords, normals):
-        """创建VAO"""
-        vao = glGenVertexArrays(1)
-        glBindVertexArray(vao)
-
-        vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
-
-        total_size = positions.nbytes + texcoords.nbytes + normals.nbytes
-        glBufferData(GL_ARRAY_BUFFER, total_size, None, GL_STATIC_DRAW)
-
-        offset = 0
-        glBufferSubData(GL_ARRAY_BUFFER, offset, positions.nbytes, positions)
-        offset += positions.nbytes
-        glBufferSubData(GL_ARRAY_BUFFER, offset, texcoords.nbytes, texcoords)
-        offset += texcoords.nbytes
-        glBufferSubData(GL_ARRAY_BUFFER, offset, normals.nbytes, normals)
-
-        # 位置
-        glVertexAttribPointer(0, 4, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(0)
-
-        # 纹理坐标
-        offset = positions.nbytes
-        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(offset))
-        glEnableVertexAttribArray(1)
-
-        # 法线
-        offset += texcoords.nbytes
-        glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(offset))
-        glEnableVertexAttribArray(2)
-
-        glBindVertexArray(0)
-        return vao
+        compact = {"position_format": "int16", "normal_format": "int2_10_10_10"}
+
+        # 球体与天空盒的纹理坐标在 [0, 1] 内，用 unorm16 比半精度更准确
+        self.sphere = Mesh(
+            *load_mesh("sphere", radius=1.0, slices=64, stacks=32),
+            texcoord_format="unorm16",
+            **compact,
+        )
+        self._report_mesh("球体", self.sphere)
+
+        # 平面的纹理重复平铺，坐标超出 [0, 1]，用半精度
+        self.plane = Mesh(
+            *load_mesh("plane", size=5.0), texcoord_format="float16", **compact
+        )
+        self._report_mesh("平面", self.plane)
+
+        self.skybox = Mesh(
+            *load_mesh("sphere", radius=5000.0, slices=64, stacks=32),
+            texcoord_format="unorm16",
+            **compact,
+        )
+        self._report_mesh("天空盒", self.skybox)
+
+    def _report_mesh(self, name, mesh):
+        print(
+            f"    ✓ {name}: {mesh.vertex_count} 顶点 ({mesh.vertex_bytes} 字节), "
+            f"{mesh.index_count} 索引"
+        )
 
     def _create_shadow_map(self):
-        """创建阴影贴图"""
+        """创建阴影贴图：深度纹理数组，每一层对应一级级联"""
         print("  创建阴影贴图...")
 
         # 创建帧缓冲对象
-        self.shadow_fbo = glGenFramebuffers(1)
+        if self.shadow_fbo is None:
+            self.shadow_fbo = glGenFramebuffers(1)
 
-        # 创建深度纹理
+        # 创建深度纹理；级联数改变时重新创建
+        if self.shadow_map is not None:
+            glDeleteTextures([self.shadow_map])
         self.shadow_map = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, self.shadow_map)
-        glTexImage2D(
-            GL_TEXTURE_2D,
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.shadow_map)
+        glTexImage3D(
+            GL_TEXTURE_2D_ARRAY,
             0,
             GL_DEPTH_COMPONENT,
             self.shadow_width,
             self.shadow_height,
+            self.shadow_cascades,
             0,
             GL_DEPTH_COMPONENT,
             GL_FLOAT,
             None,
         )
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
+        # 开启深度比较：着色器用 sampler2DArrayShadow 采样，GL_LINEAR 时硬件对 2x2 个比较结果插值
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(
+            GL_TEXTURE_2D_ARRAY, GL_TEXTURE_COMPARE_MODE, GL_COMPARE_REF_TO_TEXTURE
+        )
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_COMPARE_FUNC, GL_LEQUAL)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_BORDER)
+        glTexParameteri(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_BORDER)
         border_color = [1.0, 1.0, 1.0, 1.0]
-        glTexParameterfv(GL_TEXTURE_2D, GL_TEXTURE_BORDER_COLOR, border_color)
+        glTexParameterfv(GL_TEXTURE_2D_ARRAY, GL_TEXTURE_BORDER_COLOR, border_color)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
 
-        # 绑定深度纹理到帧缓冲
+        # 绑定深度纹理的第 0 层到帧缓冲，渲染时逐层切换
         glBindFramebuffer(GL_FRAMEBUFFER, self.shadow_fbo)
-        glFramebufferTexture2D(
-            GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_TEXTURE_2D, self.shadow_map, 0
+        glFramebufferTextureLayer(
+            GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.shadow_map, 0, 0
         )
         glDrawBuffer(GL_NONE)
         glReadBuffer(GL_NONE)
@@ -252,66 +291,239 @@ class Renderer:
         if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
             print("    ✗ 阴影帧缓冲不完整")
         else:
-            print("    ✓ 阴影贴图")
+            print(
+                f"    ✓ 阴影贴图 ({self.shadow_width}x{self.shadow_height}, "
+                f"{self.shadow_cascades} 级)"
+            )
 
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        self._shadow_signature = None
 
-    def _get_light_space_matrix(self):
-        """获取光源空间矩阵"""
+    def _create_uniform_buffers(self):
+        """创建所有程序共享的 uniform buffer：每帧数据和每个物体的数据"""
+        self.frame_data = UniformBuffer(FRAME_DATA, FRAME_DATA_BINDING)
+        self.object_data = UniformBuffer(OBJECT_DATA, OBJECT_DATA_BINDING)
+
+    def _get_light_view_matrix(self):
+        """光源的视图矩阵"""
         light_pos = glm.vec3(4.0, 4.0, 4.0)
-        light_projection = glm.ortho(-10.0, 10.0, -10.0, 10.0, 1.0, 20.0)
-        light_view = glm.lookAt(
-            light_pos, glm.vec3(0.0, 0.0, 0.0), glm.vec3(0.0, 1.0, 0.0)
-        )
-        return light_projection * light_view
+        return glm.lookAt(light_pos, glm.vec3(0.0, 0.0, 0.0), glm.vec3(0.0, 1.0, 0.0))
+
+    def _get_shadow_bounds(self, light_view):
+        """
+        所有投射物（也是接收物）在光源视图中的包围盒 (min, max)
+
+        每个物体取 包围盒八个角 与 包围球 各自给出的范围的交集：
+        静止的平面由包围盒决定，旋转的球由包围球决定，范围不随旋转变化
+        """
+        lo = glm.vec3(math.inf)
+        hi = glm.vec3(-math.inf)
+        for mesh, model in self._get_shadow_casters():
+            to_light = light_view * model
+
+            box_min, box_max = mesh.bounding_box
+            corners = [
+                glm.vec3(to_light * glm.vec4(x, y, z, 1.0))
+                for x, y, z in itertools.product(*zip(box_min, box_max))
+            ]
+            corner_lo = glm.vec3(*(min(c[i] for c in corners) for i in range(3)))
+            corner_hi = glm.vec3(*(max(c[i] for c in corners) for i in range(3)))
+
+            center = glm.vec3(to_light * glm.vec4(mesh.bounding_center, 1.0))
+            scale = max(glm.length(glm.vec3(model[i])) for i in range(3))
+            radius = glm.vec3(mesh.bounding_radius * scale)
+
+            lo = glm.min(lo, glm.max(corner_lo, center - radius))
+            hi = glm.max(hi, glm.min(corner_hi, center + radius))
+        return lo, hi
+
+    def _fit_light_projection(self, light_view, lo, hi, depth_lo, depth_hi):
+        """
+        由光源视图中的范围得到正交投影
+
+        xy 范围向外取整到 0.25 的倍数，使其大小在物体或相机移动时不易变化；
+        左下角对齐到阴影贴图的纹素，平移时阴影边缘不会闪烁。
+
+        Args:
+            lo, hi: 光源视图中需要覆盖的 xy 范围
+            depth_lo, depth_hi: 光源视图中需要覆盖的 z 范围
+        Returns:
+            (光源空间矩阵, xy 方向的宽度, 深度范围)
+        """
+        step = 0.25
+        width = max(math.ceil(max(hi.x - lo.x, hi.y - lo.y) / step), 1) * step
+        # 对齐会把左下角最多向外移动一个纹素，宽度相应多留一个纹素
+        texel = width / (self.shadow_width - 1)
+        width = texel * self.shadow_width
+        left = math.floor(lo.x / texel) * texel
+        bottom = math.floor(lo.y / texel) * texel
+
+        # 光源视图沿 -z 方向观察，留出少量余量避免恰好被近、远平面裁掉
+        near = -depth_hi - 0.1
+        far = -depth_lo + 0.1
+        projection = glm.ortho(left, left + width, bottom, bottom + width, near, far)
+        return projection * light_view, width, far - near
+
+    def _get_cascade_splits(self):
+        """各级级联沿视线方向覆盖到的距离，对数划分与均匀划分按 lambda 混合"""
+        near = self.camera.near
+        far = min(self.shadow_distance, self.camera.far)
+        n = self.shadow_cascades
+        splits = []
+        for i in range(1, n + 1):
+            log_split = near * (far / near) ** (i / n)
+            uniform_split = near + (far - near) * i / n
+            lam = self.cascade_split_lambda
+            splits.append(lam * log_split + (1 - lam) * uniform_split)
+        return splits
+
+    def _get_frustum_slice_sphere(self, d0, d1):
+        """相机视锥在视线方向 [d0, d1] 之间一段的包围球，半径只取决于 d0、d1，不随相机转动变化"""
+        camera = self.camera
+        tan_half = math.tan(math.radians(camera.fov) / 2)
+        # 截面对角线的一半
+        r0 = d0 * tan_half * math.sqrt(1 + camera.aspect**2)
+        r1 = d1 * tan_half * math.sqrt(1 + camera.aspect**2)
+        # 球心在视线上，到近、远截面四角的距离相等
+        dc = (d1**2 + r1**2 - d0**2 - r0**2) / (2 * (d1 - d0))
+        dc = min(max(dc, d0), d1)
+        radius = max(math.hypot(d1 - dc, r1), math.hypot(dc - d0, r0))
+
+        view_dir = glm.normalize(camera.target - camera.position)
+        return camera.position + view_dir * dc, radius
+
+    def _get_cascades(self):
+        """
+        计算每一级级联的光源空间矩阵
+
+        只有一级时直接拟合整个场景；多级时按视锥分段，每段包围球的直径决定 xy 范围，
+        宽度只取决于分段，相机移动时纹素大小不变，对齐纹素后阴影边缘不会闪烁。
+        深度范围总是场景的深度范围：段外朝向光源的物体也能投下阴影，
+        长度不随相机变化，cascadeScales 和深度偏移也就保持不变
+
+        Returns:
+            (光源空间矩阵列表, 各级的覆盖距离, 各级的 (1 / 宽度, 1 / 深度范围))
+        """
+        light_view = self._get_light_view_matrix()
+        lo, hi = self._get_shadow_bounds(light_view)
+
+        if self.shadow_cascades == 1:
+            matrix, width, depth = self._fit_light_projection(
+                light_view, lo, hi, lo.z, hi.z
+            )
+            return [matrix], [np.finfo(np.float32).max], [(1 / width, 1 / depth)]
+
+        matrices, scales = [], []
+        splits = self._get_cascade_splits()
+        for d0, d1 in zip([self.camera.near] + splits[:-1], splits):
+            center, radius = self._get_frustum_slice_sphere(d0, d1)
+            c = glm.vec3(light_view * glm.vec4(center, 1.0))
+            matrix, width, depth = self._fit_light_projection(
+                light_view, c - radius, c + radius, lo.z, hi.z
+            )
+            matrices.append(matrix)
+            scales.append((1 / width, 1 / depth))
+        return matrices, splits, scales
+
+    def _update_frame_data(self):
+        """填写并上传每帧共享的相机与光源数据"""
+        matrices, splits, scales = self._get_cascades()
+        n = len(matrices)
+
+        frame = self.frame_data
+        frame["lightSpaceMatrix"] = matrices[0]
+        frame["lightPos"] = (4.0, 5.0, 4.0)
+        frame["lightIntensity"] = 50.0
+        frame["viewPos"] = self.camera.position
+        frame["lightColor"] = (1.0, 1.0, 1.0)
+        frame["cascadeCount"] = n
+        frame["cascadeMatrices"] = matrices
+        frame["cascadeSplits"] = splits + [0.0] * (MAX_CASCADES - n)
+        frame["cascadeScales"] = [scale + (0.0, 0.0) for scale in scales]
+        frame["viewDir"] = glm.normalize(self.camera.target - self.camera.position)
+        frame.upload()
+
+    def _draw(self, mesh, model, view_proj, material=None, is_skybox=False):
+        """
+        上传一个物体的数据并绘制
+
+        Args:
+            mesh: 要绘制的网格
+            model: 模型矩阵
+            view_proj: 投影矩阵 * 视图矩阵
+            material: (ka, kd, ks, shininess)，None 表示沿用上一次的材料
+            is_skybox: 是否为天空盒
+        """
+        obj = self.object_data
+        obj["MVP"] = view_proj * model
+        obj["M"] = model
+        obj["normalMatrix"] = glm.transpose(glm.inverse(glm.mat3(model)))
+        if material is not None:
+            obj["ka"], obj["kd"], obj["ks"], obj["shininess"] = material
+        obj["isSkybox"] = int(is_skybox)
+        obj["dequantize"] = mesh.dequantize
+        obj.upload()
+
+        self.state.bind_vertex_array(mesh.vao)
+        mesh.draw()
+
+    def _get_plane_model(self):
+        """获取平面模型矩阵"""
+        model = glm.mat4(1.0)
+        return glm.translate(model, glm.vec3(0.0, -1.5, 0.0))
+
+    def _get_shadow_casters(self):
+        """投射阴影的物体: [(网格, 模型矩阵), ...]"""
+        return [
+            (self.sphere, self._get_sphere_model()),
+            (self.plane, self._get_plane_model()),
+        ]
 
     def _render_shadow_map(self):
-        """渲染阴影贴图"""
-        if "shadow_depth" not in self.shaders:
+        """
+        渲染阴影贴图，光源空间矩阵来自每帧数据
+
+        光源空间矩阵和所有投射物的模型矩阵与上次渲染时完全相同（例如暂停时）
+        就直接沿用已有的阴影贴图
+        """
+        shader = self._get_shader("shadow_depth")
+        if shader is None:
             return
 
-        light_space_matrix = self._get_light_space_matrix()
+        casters = self._get_shadow_casters()
+        n = self.shadow_cascades
+        signature = self.frame_data["cascadeMatrices"][:n].tobytes() + b"".join(
+            int(mesh.vao).to_bytes(4, "little") + model.to_bytes()
+            for mesh, model in casters
+        )
+        if signature == self._shadow_signature:
+            return
 
         glViewport(0, 0, self.shadow_width, self.shadow_height)
         glBindFramebuffer(GL_FRAMEBUFFER, self.shadow_fbo)
-        glClear(GL_DEPTH_BUFFER_BIT)
-
-        shader = self.shaders["shadow_depth"]
-        glUseProgram(shader)
 
-        # 渲染球体
-        model = self._get_sphere_model()
-        mvp = light_space_matrix * model
-        glUniformMatrix4fv(
-            glGetUniformLocation(shader, "lightSpaceMatrix"),
-            1,
-            GL_FALSE,
-            glm.value_ptr(mvp),
-        )
-
-        glBindVertexArray(self.sphere_vao)
-        glDrawArrays(GL_TRIANGLES, 0, self.sphere_count)
-
-        # 渲染平面
-        model = glm.mat4(1.0)
-        model = glm.translate(model, glm.vec3(0.0, -1.5, 0.0))
-        mvp = light_space_matrix * model
-        glUniformMatrix4fv(
-            glGetUniformLocation(shader, "lightSpaceMatrix"),
-            1,
-            GL_FALSE,
-            glm.value_ptr(mvp),
-        )
+        self.state.use_program(shader)
 
-        glBindVertexArray(self.plane_vao)
-        glDrawArrays(GL_TRIANGLES, 0, self.plane_count)
+        # 逐级渲染到纹理数组的各层；深度着色器使用 cascadeMatrices[i] * M，不读取 MVP
+        identity = glm.mat4(1.0)
+        for layer in range(n):
+            glFramebufferTextureLayer(
+                GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, self.shadow_map, 0, layer
+            )
+            glClear(GL_DEPTH_BUFFER_BIT)
+            shader.set_int("cascadeIndex", layer)
+            for mesh, model in casters:
+                self._draw(mesh, model, identity)
 
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
-        glUseProgram(0)
+        self._shadow_signature = signature
 
     def render(self):
         """主渲染函数"""
 
+        # 相机与光源数据每帧只上传一次，所有程序共享
+        self._update_frame_data()
+
         ##################################################
         # 如果是任务5，先渲染阴影贴图
         ##################################################
@@ -328,7 +540,7 @@ class Renderer:
 
         # 根据当前任务选择着色器
         if self.current_task in {1, 2, 3, 4, 5, 6, 7}:
-            shader = self.shaders.get(
+            shader = self._get_shader(
                 f"task{self.current_task}{'_' + self.shading_mode if self.current_task == 3 else ''}"
             )
         else:
@@ -338,150 +550,82 @@ class Renderer:
             print(f"警告: 着色器未加载")
             return
 
-        glUseProgram(shader)
+        # 程序、纹理和 VAO 的绑定都经过 self.state，与当前状态相同时不再调用 GL；
+        # 变换、光照和材料在 uniform buffer 中，这里只剩采样器等少量 uniform
+        self.state.use_program(shader)
 
-        # 设置矩阵
         view = self.camera.get_view_matrix()
         proj = self.camera.get_projection_matrix()
-        model = self._get_sphere_model()
-        mvp = proj * view * model
-
-        glUniformMatrix4fv(
-            glGetUniformLocation(shader, "MVP"), 1, GL_FALSE, glm.value_ptr(mvp)
-        )
-        glUniformMatrix4fv(
-            glGetUniformLocation(shader, "M"), 1, GL_FALSE, glm.value_ptr(model)
-        )
-
-        normal_matrix = glm.transpose(glm.inverse(glm.mat3(model)))
-        glUniformMatrix3fv(
-            glGetUniformLocation(shader, "normalMatrix"),
-            1,
-            GL_FALSE,
-            glm.value_ptr(normal_matrix),
-        )
-
-        # 设置光照参数
-        light_pos = [4.0, 5.0, 4.0]
-        glUniform3f(glGetUniformLocation(shader, "lightPos"), *light_pos)
-        glUniform3f(
-            glGetUniformLocation(shader, "viewPos"),
-            self.camera.position.x,
-            self.camera.position.y,
-            self.camera.position.z,
-        )
-        glUniform3f(glGetUniformLocation(shader, "lightColor"), 1.0, 1.0, 1.0)
-        glUniform1f(glGetUniformLocation(shader, "lightIntensity"), 50.0)
-
-        # 任务5需要光源空间矩阵
-        if self.current_task == 5 or self.use_shadow:
-            light_space_matrix = self._get_light_space_matrix()
-            glUniformMatrix4fv(
-                glGetUniformLocation(shader, "lightSpaceMatrix"),
-                1,
-                GL_FALSE,
-                glm.value_ptr(light_space_matrix),
-            )
+        view_proj = proj * view
 
         # 绑定纹理
-        glActiveTexture(GL_TEXTURE0)
-
         if self.current_task == 1:
-            # Task1: 使用无过滤纹理，会产生明显锯齿
-            glBindTexture(
-                GL_TEXTURE_2D,
-                self.textures.get("earth_no_filter", self.textures["earth"]),
-            )
+            # Task1: 最近邻过滤、不使用 mipmap，会产生明显锯齿
+            self.state.bind_texture(0, self.textures["earth"])
+            self.state.bind_sampler(0, self.samplers["nearest"])
+        elif self.current_task in {6, 7}:
+            # Task6/7: 天空盒和球体的反射都采样天空盒纹理
+            self.state.bind_texture(0, self.textures["skybox"])
+            self.state.bind_sampler(0, self.samplers["trilinear"])
         else:
-            # Task2 及以后: 使用带 mipmap 的平滑纹理
-            glBindTexture(GL_TEXTURE_2D, self.textures["earth"])
+            # Task2 及以后: 使用 mipmap 和三线性过滤
+            self.state.bind_texture(0, self.textures["earth"])
+            self.state.bind_sampler(0, self.samplers["trilinear"])
 
-        glUniform1i(glGetUniformLocation(shader, "texDiffuse"), 0)
+        shader.set_int("texDiffuse", 0)
 
         if self.current_task == 4 or self.use_bump:
-            glActiveTexture(GL_TEXTURE1)
-            glBindTexture(GL_TEXTURE_2D, self.textures["bump"])
-            glUniform1i(glGetUniformLocation(shader, "texBump"), 1)
-            glUniform1f(
-                glGetUniformLocation(shader, "bumpStrength"), self.bump_strength
-            )
+            self.state.bind_texture(1, self.textures["bump"])
+            self.state.bind_sampler(1, self.samplers["trilinear"])
+            shader.set_int("texBump", 1)
+            shader.set_float("bumpStrength", self.bump_strength)
 
         if self.current_task == 5 or self.use_shadow:
-            glActiveTexture(GL_TEXTURE2)
-            glBindTexture(GL_TEXTURE_2D, self.shadow_map)
-            glUniform1i(glGetUniformLocation(shader, "shadowMap"), 2)
+            self.state.bind_texture(2, self.shadow_map, GL_TEXTURE_2D_ARRAY)
+            shader.set_int("shadowMap", 2)
+            shader.set_int("pcfMode", PCF_MODES.index(self.pcf_mode))
+
+        # 球体的材料
+        if self.current_task == 6:
+            sphere_material = (0.02, 0.5, 1.0, 512.0)
+        elif self.current_task == 7:
+            sphere_material = (0.02, 0.5, 1.0, 256.0)
+        else:
+            sphere_material = (0.02, 0.5, 1.0, 128.0)
 
         ##################################################
         # 任务6渲染天空盒，需要在渲染球体之前
         ##################################################
         if self.current_task in {6, 7}:
-            model = glm.mat4(1.0)
-            mvp = proj * view * model
-            glUniformMatrix4fv(
-                glGetUniformLocation(shader, "MVP"), 1, GL_FALSE, glm.value_ptr(mvp)
+            self._draw(
+                self.skybox,
+                glm.mat4(1.0),
+                view_proj,
+                sphere_material,
+                is_skybox=True,
             )
-            glUniformMatrix4fv(
-                glGetUniformLocation(shader, "M"), 1, GL_FALSE, glm.value_ptr(model)
-            )
-            glUniform1i(glGetUniformLocation(shader, "isSkybox"), 1)
-
-            glBindVertexArray(self.skybox_vao)
-            glBindTexture(GL_TEXTURE_2D, self.textures["skybox"])
-            glDrawArrays(GL_TRIANGLES, 0, self.skybox_count)
 
         ##################################################
         # 渲染球体
         ##################################################
-        glUniform1f(glGetUniformLocation(shader, "ka"), 0.02)
-        glUniform1f(glGetUniformLocation(shader, "kd"), 0.5)
-        glUniform1f(glGetUniformLocation(shader, "ks"), 1.0)
-        if self.current_task in {6, 7}:
-            glUniform1f(
-                glGetUniformLocation(shader, "shininess"),
-                512.0 if self.current_task == 6 else 256.0,
-            )
-            glUniform1i(glGetUniformLocation(shader, "isSkybox"), 0)
-            glActiveTexture(GL_TEXTURE0)
-            glBindTexture(GL_TEXTURE_2D, self.textures["skybox"])
-        else:
-            glUniform1f(glGetUniformLocation(shader, "shininess"), 128.0)
-        glBindVertexArray(self.sphere_vao)
-        glDrawArrays(GL_TRIANGLES, 0, self.sphere_count)
+        self._draw(
+            self.sphere,
+            self._get_sphere_model(),
+            view_proj,
+            sphere_material,
+        )
 
         ##################################################
         # 任务5渲染平面
         ##################################################
         if self.current_task == 5:
-            model = glm.mat4(1.0)
-            model = glm.translate(model, glm.vec3(0.0, -1.5, 0.0))
-            mvp = proj * view * model
-            glUniformMatrix4fv(
-                glGetUniformLocation(shader, "MVP"), 1, GL_FALSE, glm.value_ptr(mvp)
-            )
-            glUniformMatrix4fv(
-                glGetUniformLocation(shader, "M"), 1, GL_FALSE, glm.value_ptr(model)
+            self.state.bind_texture(0, self.textures["plane"])
+            self._draw(
+                self.plane,
+                self._get_plane_model(),
+                view_proj,
+                (0.002, 2.0, 1.0, 32.0),
             )
-            glUniform1f(glGetUniformLocation(shader, "ka"), 0.002)
-            glUniform1f(glGetUniformLocation(shader, "kd"), 2.0)
-            glUniform1f(glGetUniformLocation(shader, "ks"), 1.0)
-            glUniform1f(glGetUniformLocation(shader, "shininess"), 32.0)
-
-            if self.use_shadow:
-                light_space_matrix = self._get_light_space_matrix()
-                glUniformMatrix4fv(
-                    glGetUniformLocation(shader, "lightSpaceMatrix"),
-                    1,
-                    GL_FALSE,
-                    glm.value_ptr(light_space_matrix),
-                )
-
-            glActiveTexture(GL_TEXTURE0)
-            glBindTexture(GL_TEXTURE_2D, self.textures["plane"])
-
-            glBindVertexArray(self.plane_vao)
-            glDrawArrays(GL_TRIANGLES, 0, self.plane_count)
-
-        glUseProgram(0)
 
     def _get_sphere_model(self):
         """获取球体模型矩阵"""
@@ -490,32 +634,80 @@ class Renderer:
         model = glm.rotate(model, glm.radians(23.5), glm.vec3(0, 0, 1))
         return model
 
+    def is_animating(self):
+        """球在旋转或相机在移动，画面每一帧都在变化"""
+        return not self.is_paused or self.camera.is_moving()
+
     def update(self, delta_time):
-        """更新"""
+        """按实际经过的时间更新，画面有变化时标记需要重绘"""
+        if not self.is_animating():
+            return
         if not self.is_paused:
             self.time += delta_time
-        self.camera.tick()
+        self.camera.tick(delta_time)
+        self.needs_redraw = True
 
     def set_task(self, task):
         """设置任务"""
         self.current_task = task
         print(f"\n>>> 切换到任务 {task}")
+        self._prepare_shaders()
+        self.needs_redraw = True
 
     def set_shading_mode(self, mode):
         """设置光照模式"""
         self.shading_mode = mode
         print(f"\n>>> 光照模式: {mode}")
+        self._prepare_shaders()
+        self.needs_redraw = True
 
     def toggle_bump(self):
         """切换Bump Mapping"""
         self.use_bump = not self.use_bump
         print(f"\n>>> Bump Mapping: {'开启' if self.use_bump else '关闭'}")
+        self.needs_redraw = True
 
     def toggle_shadow(self):
         """切换阴影"""
         self.use_shadow = not self.use_shadow
         print(f"\n>>> 阴影: {'开启' if self.use_shadow else '关闭'}")
+        self._prepare_shaders()
+        self.needs_redraw = True
+
+    def set_pcf_mode(self, mode):
+        """设置 PCF 采样方式，mode 为 PCF_MODES 之一"""
+        if mode not in PCF_MODES:
+            raise ValueError(f"未知的 PCF 采样方式: {mode}")
+        self.pcf_mode = mode
+        print(f"\n>>> PCF: {mode}")
+        self.needs_redraw = True
+
+    def cycle_pcf_mode(self):
+        """切换到下一种 PCF 采样方式"""
+        index = PCF_MODES.index(self.pcf_mode)
+        self.set_pcf_mode(PCF_MODES[(index + 1) % len(PCF_MODES)])
+
+    def set_shadow_cascades(self, count):
+        """设置阴影级联数（1 到 MAX_CASCADES），重新创建阴影贴图"""
+        if not 1 <= count <= MAX_CASCADES:
+            raise ValueError(f"阴影级联数应在 1 到 {MAX_CASCADES} 之间: {count}")
+        self.shadow_cascades = count
+        print(f"\n>>> 阴影级联: {count}")
+        self._create_shadow_map()
+        self.state.invalidate()
+        self.needs_redraw = True
+
+    def cycle_shadow_cascades(self):
+        """在 1、2、4 级级联之间切换"""
+        options = [1, 2, 4]
+        index = (
+            options.index(self.shadow_cascades)
+            if self.shadow_cascades in options
+            else -1
+        )
+        self.set_shadow_cascades(options[(index + 1) % len(options)])
 
     def toggle_pause(self):
         self.is_paused = not self.is_paused
         print(f"\n>>> 运行状态: {'暂停' if self.is_paused else '运行'}")
+        self.needs_redraw = True
@@ -0,0 +1,201 @@
+import ctypes
+import hashlib
+import os
+
+from OpenGL.GL import *
+from OpenGL.GL import shaders as gl_shaders
+from OpenGL.error import GLError
+from pyglm import glm
+
+
+def link_program(vert_src, frag_src):
+    """
+    编译并链接一个程序，链接前请求驱动保留程序二进制，供 ProgramCache 保存
+
+    编译失败时抛出 gl_shaders.ShaderCompilationError，链接失败时抛出 RuntimeError。
+    """
+    vert = gl_shaders.compileShader(vert_src, GL_VERTEX_SHADER)
+    frag = gl_shaders.compileShader(frag_src, GL_FRAGMENT_SHADER)
+
+    program = glCreateProgram()
+    glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+    glAttachShader(program, vert)
+    glAttachShader(program, frag)
+    glLinkProgram(program)
+    glDetachShader(program, vert)
+    glDetachShader(program, frag)
+    glDeleteShader(vert)
+    glDeleteShader(frag)
+
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        info_log = glGetProgramInfoLog(program)
+        glDeleteProgram(program)
+        raise RuntimeError(f"链接失败: {info_log.decode()}")
+    return program
+
+
+class ProgramCache:
+    """
+    程序二进制的磁盘缓存
+
+    以 驱动信息 + 顶点/片段着色器源码 的哈希为键，用 glGetProgramBinary 保存链接好的程序，
+    下次启动时用 glProgramBinary 直接加载，跳过编译和链接。
+    驱动升级后二进制可能不再被接受，此时删除缓存文件并回退到正常编译。
+    """
+
+    def __init__(self, cache_dir=".shader_cache"):
+        self.cache_dir = cache_dir
+        self.enabled = glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+        self._driver = "|".join(
+            (glGetString(name) or b"").decode(errors="replace")
+            for name in (GL_VENDOR, GL_RENDERER, GL_VERSION)
+        )
+        if self.enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, vert_src, frag_src):
+        h = hashlib.blake2b(digest_size=16)
+        for part in (self._driver, vert_src, frag_src):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return os.path.join(self.cache_dir, f"{h.hexdigest()}.bin")
+
+    def get_program(self, vert_src, frag_src):
+        """
+        获取程序：优先从缓存加载，否则编译链接并写入缓存
+
+        Returns:
+            (program, 是否来自缓存)
+        """
+        if self.enabled:
+            program = self._load(self._path(vert_src, frag_src))
+            if program is not None:
+                return program, True
+
+        program = link_program(vert_src, frag_src)
+        if self.enabled:
+            self._store(program, self._path(vert_src, frag_src))
+        return program, False
+
+    def _load(self, path):
+        """加载缓存的二进制；缓存不存在或被驱动拒绝时返回 None，被拒绝的缓存文件会被删除"""
+        if not os.path.exists(path):
+            return None
+
+        program = None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            if len(data) > 4:
+                binary_format = int.from_bytes(data[:4], "little")
+                binary = data[4:]
+                program = glCreateProgram()
+                # 驱动不再支持这种二进制格式时 glProgramBinary 报 GL_INVALID_ENUM
+                glProgramBinary(program, binary_format, binary, len(binary))
+                if glGetProgramiv(program, GL_LINK_STATUS):
+                    return program
+        except (GLError, OSError):
+            pass
+
+        # 文件损坏或驱动拒绝了这份二进制（驱动更新等），删除后重新编译
+        if program is not None:
+            glDeleteProgram(program)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+
+    def _store(self, program, path):
+        size = glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH)
+        if size <= 0:
+            return
+        length = GLsizei(0)
+        binary_format = GLenum(0)
+        binary = (ctypes.c_ubyte * size)()
+        glGetProgramBinary(
+            program, size, ctypes.byref(length), ctypes.byref(binary_format), binary
+        )
+
+        # 先写临时文件再改名，避免中断时留下不完整的缓存
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(int(binary_format.value).to_bytes(4, "little"))
+            f.write(bytes(binary)[: length.value])
+        os.replace(tmp_path, path)
+
+
+class ShaderProgram:
+    """
+    着色器程序封装
+
+    链接完成后一次性反射所有活动 uniform，建立 名称 -> location 的字典，
+    之后每帧不再调用 glGetUniformLocation；setter 记住上次上传的值，值不变时跳过上传。
+    setter 作用于当前使用的程序，调用前需先 GLState.use_program。
+    """
+
+    def __init__(self, program):
+        self.program = program
+        self.uniforms = {}
+        self._values = {}  # location -> 上次上传的值
+
+        count = glGetProgramiv(program, GL_ACTIVE_UNIFORMS)
+        for index in range(count):
+            name, _, _ = glGetActiveUniform(program, index)
+            name = name.decode() if isinstance(name, bytes) else name
+            location = glGetUniformLocation(program, name)
+            if location < 0:
+                continue  # uniform block 中的成员没有 location
+            self.uniforms[name] = location
+            if name.endswith("[0]"):
+                # 数组同时可以用不带下标的名字访问
+                self.uniforms[name[:-3]] = location
+
+    def __int__(self):
+        return int(self.program)
+
+    def has_uniform(self, name):
+        return name in self.uniforms
+
+    def _changed(self, name, value):
+        """返回需要上传的 location；uniform 不存在或值没有变化时返回 None"""
+        location = self.uniforms.get(name)
+        if location is None:
+            # 未使用的 uniform 会被编译器优化掉，与 glUniform*(-1, ...) 一样静默忽略
+            return None
+        if self._values.get(location) == value:
+            return None
+        self._values[location] = value
+        return location
+
+    def set_int(self, name, value):
+        location = self._changed(name, int(value))
+        if location is not None:
+            glUniform1i(location, int(value))
+
+    def set_float(self, name, value):
+        location = self._changed(name, float(value))
+        if location is not None:
+            glUniform1f(location, float(value))
+
+    def set_vec3(self, name, x, y=None, z=None):
+        value = glm.vec3(x) if y is None else glm.vec3(x, y, z)
+        location = self._changed(name, value)
+        if location is not None:
+            glUniform3f(location, value.x, value.y, value.z)
+
+    def set_mat3(self, name, value):
+        value = glm.mat3(value)  # 复制一份，调用方之后修改原矩阵不影响比较
+        location = self._changed(name, value)
+        if location is not None:
+            glUniformMatrix3fv(location, 1, GL_FALSE, glm.value_ptr(value))
+
+    def set_mat4(self, name, value):
+        value = glm.mat4(value)
+        location = self._changed(name, value)
+        if location is not None:
+            glUniformMatrix4fv(location, 1, GL_FALSE, glm.value_ptr(value))
+
+    def invalidate(self):
+        """忘记已上传的值，下次 set 时重新上传（例如程序被重新链接后）"""
+        self._values.clear()
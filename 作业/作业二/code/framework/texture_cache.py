@@ -0,0 +1,335 @@
+"""
+纹理预处理与缓存
+
+在 CPU 上用 NumPy 生成完整的 mip 链（颜色纹理在线性空间中下采样），
+可选压缩为 BC1 / BC3，结果按 源文件路径 + 修改时间 缓存到磁盘。
+启动时命中缓存就不再解码 JPEG，各级直接上传。
+
+不依赖 GL，可以离线预先生成缓存:
+    python -m framework.texture_cache resources/earthmap.jpg resources/skybox.jpg
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+TEXTURE_CACHE_DIR = ".texture_cache"
+_CACHE_VERSION = 2  # 预处理算法变化时加 1，使旧缓存失效
+
+# 像素格式: "r8" / "rgb8" / "rgba8" 为未压缩，"bc1" / "bc3" 为块压缩
+# 单通道的灰度图（高度图等）保持单通道，不压缩时上传为 r8，只占 RGB 的三分之一
+
+
+@dataclass
+class PreparedTexture:
+    """预处理好的纹理：format 为像素格式，levels 的每一级为 (宽, 高, 数据)"""
+
+    format: str
+    levels: list
+
+    @property
+    def nbytes(self):
+        return sum(len(data) for _, _, data in self.levels)
+
+
+# ---------------------------------------------------------------------------
+# mip 链
+# ---------------------------------------------------------------------------
+
+
+def srgb_to_linear(c):
+    c = np.asarray(c, dtype=np.float32) / 255.0
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(c):
+    c = np.clip(c, 0.0, 1.0)
+    c = np.where(c <= 0.0031308, c * 12.92, 1.055 * c ** (1 / 2.4) - 0.055)
+    return np.round(c * 255.0).astype(np.uint8)
+
+
+def _downsample(level):
+    """2x2 盒式滤波，尺寸为 max(1, 原尺寸 // 2)，与 GL 的 mip 尺寸规则一致"""
+    h, w = level.shape[:2]
+    if h > 1:
+        level = 0.5 * (level[0 : h // 2 * 2 : 2] + level[1 : h // 2 * 2 : 2])
+    if w > 1:
+        level = 0.5 * (level[:, 0 : w // 2 * 2 : 2] + level[:, 1 : w // 2 * 2 : 2])
+    return level
+
+
+def build_mip_chain(image, srgb=True):
+    """
+    生成从原图到 1x1 的完整 mip 链
+
+    Args:
+        image: (H, W, C) uint8，C 为 1、3 或 4
+        srgb: 颜色是否为 sRGB 编码；为 True 时在线性空间中平均再编码回 sRGB，
+              避免缩小后整体变暗。alpha 以及高度图等数据纹理总是直接平均
+    Returns:
+        各级 (h, w, C) uint8 数组的列表
+    """
+    channels = image.shape[2]
+    color = min(channels, 3) if srgb else 0
+
+    level = image.astype(np.float32)
+    if color:
+        level[..., :color] = srgb_to_linear(image[..., :color])
+    else:
+        level /= 255.0
+
+    def encode(lv):
+        out = np.empty(lv.shape, dtype=np.uint8)
+        out[..., :color] = linear_to_srgb(lv[..., :color])
+        out[..., color:] = np.round(np.clip(lv[..., color:], 0, 1) * 255)
+        return out
+
+    levels = [image]
+    while level.shape[0] > 1 or level.shape[1] > 1:
+        level = _downsample(level)
+        levels.append(encode(level))
+    return levels
+
+
+# ---------------------------------------------------------------------------
+# BC1 / BC3 编码
+# ---------------------------------------------------------------------------
+
+
+def _to_blocks(image):
+    """(H, W, C) 按边缘复制补齐为 4 的倍数后切成 (N, 16, C) 的 4x4 块，按行优先排列"""
+    h, w, c = image.shape
+    ph, pw = -h % 4, -w % 4
+    if ph or pw:
+        image = np.pad(image, ((0, ph), (0, pw), (0, 0)), mode="edge")
+    bh, bw = image.shape[0] // 4, image.shape[1] // 4
+    blocks = image.reshape(bh, 4, bw, 4, c).transpose(0, 2, 1, 3, 4)
+    return blocks.reshape(bh * bw, 16, c)
+
+
+def _to_565(rgb):
+    r = np.round(rgb[:, 0] * 31 / 255).astype(np.uint16)
+    g = np.round(rgb[:, 1] * 63 / 255).astype(np.uint16)
+    b = np.round(rgb[:, 2] * 31 / 255).astype(np.uint16)
+    return (r << 11) | (g << 5) | b
+
+
+def _from_565(c):
+    r = (c >> 11) & 31
+    g = (c >> 5) & 63
+    b = c & 31
+    return np.stack([r * 255 / 31, g * 255 / 63, b * 255 / 31], axis=1)
+
+
+def _nearest(texels, palette):
+    """每个像素在调色板中最近的颜色编号，texels (N, 16, C)，palette (N, K, C)"""
+    d = ((texels[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=-1)
+    return np.argmin(d, axis=-1).astype(np.uint32)
+
+
+def _pack_indices(indices, bits):
+    """(N, 16) 的编号按像素顺序从低位到高位打包"""
+    shifts = np.arange(16, dtype=np.uint64) * bits
+    return (indices.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+
+
+def _encode_color_blocks(blocks, force_four_color=False):
+    """
+    颜色块编码：端点取包围盒两角并向内收缩 1/16，调色板为端点间的 4 个等分点
+
+    Returns:
+        (N, 8) uint8，color0、color1 (565) 与 16 个 2 位编号
+    """
+    rgb = blocks[:, :, :3].astype(np.float32)
+    lo = rgb.min(axis=1)
+    hi = rgb.max(axis=1)
+    inset = (hi - lo) / 16
+    c0 = _to_565(np.clip(hi - inset, 0, 255))
+    c1 = _to_565(np.clip(lo + inset, 0, 255))
+
+    # BC1 中 color0 > color1 才是 4 色模式；相等时所有编号为 0，解码结果就是 color0
+    swap = c0 < c1
+    c0, c1 = np.where(swap, c1, c0), np.where(swap, c0, c1)
+    e0, e1 = _from_565(c0), _from_565(c1)
+    palette = np.stack([e0, e1, (2 * e0 + e1) / 3, (e0 + 2 * e1) / 3], axis=1).astype(
+        np.float32
+    )
+    indices = _nearest(rgb, palette)
+    if not force_four_color:
+        indices[c0 == c1] = 0
+
+    out = np.empty((len(blocks), 8), dtype=np.uint8)
+    out[:, 0:2] = c0.astype("<u2").view(np.uint8).reshape(-1, 2)
+    out[:, 2:4] = c1.astype("<u2").view(np.uint8).reshape(-1, 2)
+    out[:, 4:8] = _pack_indices(indices, 2).astype("<u4").view(np.uint8).reshape(-1, 4)
+    return out
+
+
+def _encode_alpha_blocks(blocks):
+    """
+    BC3 的 alpha 块：a0 = 最大值，a1 = 最小值，8 级插值
+
+    Returns:
+        (N, 8) uint8，a0、a1 与 16 个 3 位编号
+    """
+    alpha = blocks[:, :, 3].astype(np.float32)
+    a0 = alpha.max(axis=1)
+    a1 = alpha.min(axis=1)
+    k = np.arange(1, 7, dtype=np.float32)
+    inner = ((7 - k) * a0[:, None] + k * a1[:, None]) / 7
+    palette = np.concatenate([a0[:, None], a1[:, None], np.floor(inner)], axis=1)
+    indices = _nearest(alpha[:, :, None], palette[:, :, None])
+    indices[a0 == a1] = 0
+
+    out = np.empty((len(blocks), 8), dtype=np.uint8)
+    out[:, 0] = a0
+    out[:, 1] = a1
+    packed = _pack_indices(indices, 3).astype("<u8").view(np.uint8).reshape(-1, 8)
+    out[:, 2:8] = packed[:, 0:6]
+    return out
+
+
+def encode_bc1(image):
+    """(H, W, 3|4) uint8 编码为 BC1，忽略 alpha"""
+    return _encode_color_blocks(_to_blocks(image)).tobytes()
+
+
+def encode_bc3(image):
+    """(H, W, 4) uint8 编码为 BC3：alpha 块 + 4 色模式的颜色块"""
+    blocks = _to_blocks(image)
+    alpha = _encode_alpha_blocks(blocks)
+    color = _encode_color_blocks(blocks, force_four_color=True)
+    return np.concatenate([alpha, color], axis=1).tobytes()
+
+
+# ---------------------------------------------------------------------------
+# 预处理与缓存
+# ---------------------------------------------------------------------------
+
+
+def read_image(path):
+    """解码并上下翻转为 (H, W, C) uint8，灰度图保持单通道，其他模式转换为 RGB"""
+    with Image.open(path) as img:
+        img = img.transpose(Image.FLIP_TOP_BOTTOM)
+        if img.mode not in ("L", "RGB", "RGBA"):
+            img = img.convert("RGB")
+        image = np.asarray(img, dtype=np.uint8)
+    return image[..., None] if image.ndim == 2 else image
+
+
+def prepare_texture(path, compression="auto", srgb=True):
+    """
+    解码图片并生成 mip 链，按需压缩
+
+    Args:
+        compression: "auto"（RGB 用 BC1，RGBA 用 BC3）、"bc1"、"bc3" 或 None（不压缩）；
+                     单通道图片压缩时先复制为 RGB
+        srgb: 见 build_mip_chain
+    """
+    image = read_image(path)
+    if compression is not None and image.shape[2] == 1:
+        image = np.repeat(image, 3, axis=2)
+    channels = image.shape[2]
+    if compression == "auto":
+        compression = "bc3" if channels == 4 else "bc1"
+    if compression == "bc3" and channels == 3:
+        image = np.concatenate(
+            [image, np.full(image.shape[:2] + (1,), 255, np.uint8)], axis=2
+        )
+
+    mips = build_mip_chain(image, srgb=srgb)
+    if compression is None:
+        fmt = {1: "r8", 3: "rgb8", 4: "rgba8"}[channels]
+        levels = [(m.shape[1], m.shape[0], m.tobytes()) for m in mips]
+    else:
+        encode = {"bc1": encode_bc1, "bc3": encode_bc3}[compression]
+        fmt = compression
+        levels = [(m.shape[1], m.shape[0], encode(m)) for m in mips]
+    return PreparedTexture(fmt, levels)
+
+
+def _cache_path(path, compression, srgb, cache_dir):
+    stat = os.stat(path)
+    key = repr(
+        (
+            _CACHE_VERSION,
+            os.path.abspath(path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            compression,
+            srgb,
+        )
+    )
+    digest = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir, f"{name}-{digest}.npz")
+
+
+def load_prepared_texture(
+    path, compression="auto", srgb=True, cache_dir=TEXTURE_CACHE_DIR
+):
+    """
+    获取预处理好的纹理：命中缓存时直接读取，否则预处理并写入缓存
+
+    源文件被修改后修改时间变化，对应的是另一个缓存文件
+    """
+    cache_path = _cache_path(path, compression, srgb, cache_dir)
+    if os.path.exists(cache_path):
+        try:
+            with np.load(cache_path) as data:
+                meta = json.loads(str(data["meta"]))
+                levels = [
+                    (w, h, data[f"level{i}"].tobytes())
+                    for i, (w, h) in enumerate(meta["sizes"])
+                ]
+            return PreparedTexture(meta["format"], levels)
+        except (OSError, ValueError, KeyError):
+            pass  # 缓存损坏时重新生成
+
+    texture = prepare_texture(path, compression, srgb)
+    meta = {"format": texture.format, "sizes": [(w, h) for w, h, _ in texture.levels]}
+    arrays = {
+        f"level{i}": np.frombuffer(data, dtype=np.uint8)
+        for i, (_, _, data) in enumerate(texture.levels)
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    # 先写临时文件再改名，避免中断时留下不完整的缓存
+    tmp_path = cache_path + ".tmp.npz"
+    np.savez(tmp_path, meta=json.dumps(meta), **arrays)
+    os.replace(tmp_path, cache_path)
+    return texture
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预先生成纹理的 mip 链与压缩缓存")
+    parser.add_argument("paths", nargs="+", help="图片文件")
+    parser.add_argument(
+        "--compression",
+        choices=["auto", "bc1", "bc3", "none"],
+        default="auto",
+        help="压缩格式，none 表示只生成 mip 链",
+    )
+    parser.add_argument(
+        "--linear", action="store_true", help="按线性数据处理（高度图、法线贴图等）"
+    )
+    parser.add_argument("--cache-dir", default=TEXTURE_CACHE_DIR)
+    args = parser.parse_args()
+
+    compression = None if args.compression == "none" else args.compression
+    for path in args.paths:
+        texture = load_prepared_texture(
+            path, compression, not args.linear, args.cache_dir
+        )
+        print(
+            f"{path}: {texture.format}, {len(texture.levels)} 级, "
+            f"{texture.nbytes / 1024:.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,82 +1,146 @@
-import numpy as np
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+
 from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import (
+    GL_COMPRESSED_RGB_S3TC_DXT1_EXT,
+    GL_COMPRESSED_RGBA_S3TC_DXT5_EXT,
+)
 
+from .texture_cache import load_prepared_texture
 
-def load_texture(path, mipmap=True, use_linear=True):
-    """加载纹理"""
-    texture = glGenTextures(1)
+# 预处理后的像素格式 -> (GL 内部格式, 上传格式)，压缩格式的上传格式为 None
+PIXEL_FORMATS = {
+    "r8": (GL_R8, GL_RED),
+    "rgb8": (GL_RGB8, GL_RGB),
+    "rgba8": (GL_RGBA8, GL_RGBA),
+    "bc1": (GL_COMPRESSED_RGB_S3TC_DXT1_EXT, None),
+    "bc3": (GL_COMPRESSED_RGBA_S3TC_DXT5_EXT, None),
+}
 
-    try:
-        img = Image.open(path)
-        img = img.transpose(Image.FLIP_TOP_BOTTOM)
-        img_data = np.array(img, dtype=np.uint8)
+# 采样器名称 -> (缩小过滤, 放大过滤)
+SAMPLER_FILTERS = {
+    # 最近邻过滤，只采样第 0 级（会产生明显锯齿）
+    "nearest": (GL_NEAREST, GL_NEAREST),
+    "linear": (GL_LINEAR, GL_LINEAR),
+    # 三线性过滤（最平滑）
+    "trilinear": (GL_LINEAR_MIPMAP_LINEAR, GL_LINEAR),
+}
 
-        glBindTexture(GL_TEXTURE_2D, texture)
 
-        if img.mode == "RGB":
-            format_type = GL_RGB
-        elif img.mode == "RGBA":
-            format_type = GL_RGBA
-        else:
-            img = img.convert("RGB")
-            img_data = np.array(img, dtype=np.uint8)
-            format_type = GL_RGB
-
-        glTexImage2D(
-            GL_TEXTURE_2D,
-            0,
-            format_type,
-            img.width,
-            img.height,
-            0,
-            format_type,
-            GL_UNSIGNED_BYTE,
-            img_data,
-        )
-
-        if mipmap:
-            glGenerateMipmap(GL_TEXTURE_2D)
-            if use_linear:
-                # 三线性过滤（最平滑）
-                glTexParameteri(
-                    GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR
-                )
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            else:
-                # 最近邻过滤（会产生锯齿）
-                glTexParameteri(
-                    GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST_MIPMAP_NEAREST
-                )
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+def s3tc_supported():
+    """驱动是否支持 S3TC（BC1 / BC3）压缩纹理"""
+    count = glGetIntegerv(GL_NUM_EXTENSIONS)
+    return any(
+        glGetStringi(GL_EXTENSIONS, i) == b"GL_EXT_texture_compression_s3tc"
+        for i in range(count)
+    )
+
+
+def upload_prepared_texture(prepared):
+    """把预处理好的各级逐级上传为一张新纹理，不再调用 glGenerateMipmap"""
+    internal_format, upload_format = PIXEL_FORMATS[prepared.format]
+    texture = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, texture)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    for level, (width, height, data) in enumerate(prepared.levels):
+        if upload_format is None:
+            # PyOpenGL 的封装由 data 计算 imageSize，不再单独传入
+            glCompressedTexImage2D(
+                GL_TEXTURE_2D, level, internal_format, width, height, 0, data
+            )
         else:
-            if use_linear:
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            else:
-                # 最近邻过滤（会产生明显锯齿）
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexImage2D(
+                GL_TEXTURE_2D,
+                level,
+                internal_format,
+                width,
+                height,
+                0,
+                upload_format,
+                GL_UNSIGNED_BYTE,
+                data,
+            )
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, 0)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(prepared.levels) - 1)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    return texture
 
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
 
-        # if mipmap and use_linear:
-        #    max_anisotropy = glGetFloatv(GL_MAX_TEXTURE_MAX_ANISOTROPY_EXT)
-        #    glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAX_ANISOTROPY_EXT, max_anisotropy)
+class TextureManager:
+    """
+    纹理管理器
 
-        return texture
+    每个文件只处理、上传一次：request 把预处理任务交给后台线程池，
+    预处理结果（完整 mip 链，可选 BC1 / BC3 压缩）按 路径 + 修改时间 缓存在磁盘上，
+    命中缓存时不再解码图片；get 在主线程（持有 GL 上下文）等待任务完成后逐级上传。
+    过滤方式不再是纹理本身的参数，而是由 sampler 对象决定，
+    同一张纹理可以用不同的 sampler 以不同方式采样。
+    """
+
+    def __init__(self, workers=4, compression="auto"):
+        """
+        Args:
+            workers: 后台线程数
+            compression: 颜色纹理的默认压缩方式，见 prepare_texture；驱动不支持 S3TC 时不压缩
+        """
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self.compression = compression if s3tc_supported() else None
+        self._paths = {}  # 名称 -> 键
+        self._pending = {}  # 键 -> 预处理任务
+        self._textures = {}  # 键 -> 纹理
+        self._info = {}  # 键 -> (像素格式, 显存占用)
+        self._samplers = {}
+
+    def request(self, name, path, compress=True, srgb=True):
+        """
+        登记纹理并在后台开始预处理；同一文件以同样方式处理只做一次
 
-    except Exception as e:
-        print(f"加载纹理失败 {path}: {e}")
-        return 0
+        Args:
+            compress: 是否压缩；高度图等细节敏感的数据纹理应传 False
+            srgb: 是否为 sRGB 颜色，数据纹理应传 False，见 build_mip_chain
+        """
+        compression = self.compression if compress else None
+        key = (path, compression, srgb)
+        self._paths[name] = key
+        if key not in self._pending and key not in self._textures:
+            self._pending[key] = self._pool.submit(
+                load_prepared_texture, path, compression, srgb
+            )
 
+    def get(self, name):
+        """获取纹理，第一次调用时等待预处理完成并上传；失败时抛出预处理时的异常"""
+        key = self._paths[name]
+        texture = self._textures.get(key)
+        if texture is not None:
+            return texture
+
+        try:
+            prepared = self._pending.pop(key).result()
+        except Exception:
+            self._textures[key] = 0  # 失败的纹理为 0，绑定时相当于解绑
+            raise
+        texture = upload_prepared_texture(prepared)
+        self._textures[key] = texture
+        self._info[key] = (prepared.format, prepared.nbytes)
+        return texture
 
-def load_texture_no_filter(path):
-    """加载纹理（无过滤，用于演示锯齿）"""
-    return load_texture(path, mipmap=False, use_linear=False)
+    def describe(self, name):
+        """纹理的像素格式与所有级别的总字节数"""
+        return self._info.get(self._paths[name], (None, 0))
 
+    def sampler(self, name):
+        """获取 SAMPLER_FILTERS 中对应的 sampler 对象，重复平铺"""
+        sampler = self._samplers.get(name)
+        if sampler is None:
+            min_filter, mag_filter = SAMPLER_FILTERS[name]
+            sampler = glGenSamplers(1)
+            glSamplerParameteri(sampler, GL_TEXTURE_MIN_FILTER, min_filter)
+            glSamplerParameteri(sampler, GL_TEXTURE_MAG_FILTER, mag_filter)
+            glSamplerParameteri(sampler, GL_TEXTURE_WRAP_S, GL_REPEAT)
+            glSamplerParameteri(sampler, GL_TEXTURE_WRAP_T, GL_REPEAT)
+            self._samplers[name] = sampler
+        return sampler
 
-def load_texture_with_mipmap(path):
-    """加载纹理（带 mipmap 和三线性过滤）"""
-    return load_texture(path, mipmap=True, use_linear=True)
+    def close(self):
+        """结束后台线程，已上传的纹理和 sampler 仍可使用"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
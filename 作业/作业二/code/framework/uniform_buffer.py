@@ -0,0 +1,135 @@
+import numpy as np
+from OpenGL.GL import *
+from pyglm import glm
+
+# 与着色器中的 uniform block 一一对应，偏移按 std140 规则排布：
+# vec3 按 16 字节对齐，其后的 float 可以填进同一个 16 字节槽；
+# mat3 的每一列占一个 vec4，因此是 (3, 4)；矩阵按列存放，与 glm 的内存布局一致，
+# 结构体中矩阵字段的每一行是一列
+
+FRAME_DATA_BINDING = 0
+MAX_CASCADES = 4  # 与着色器中 cascadeMatrices 等数组的长度一致
+FRAME_DATA = np.dtype(
+    {
+        "names": [
+            "lightSpaceMatrix",
+            "lightPos",
+            "lightIntensity",
+            "viewPos",
+            "lightColor",
+            "cascadeCount",
+            "cascadeMatrices",
+            "cascadeSplits",
+            "cascadeScales",
+            "viewDir",
+        ],
+        "formats": [
+            ("<f4", (4, 4)),
+            ("<f4", 3),
+            "<f4",
+            ("<f4", 3),
+            ("<f4", 3),
+            "<i4",
+            ("<f4", (MAX_CASCADES, 4, 4)),
+            ("<f4", MAX_CASCADES),
+            ("<f4", (MAX_CASCADES, 4)),
+            ("<f4", 3),
+        ],
+        "offsets": [0, 64, 76, 80, 96, 108, 112, 368, 384, 448],
+        "itemsize": 464,
+    }
+)
+
+OBJECT_DATA_BINDING = 1
+OBJECT_DATA = np.dtype(
+    {
+        "names": [
+            "MVP",
+            "M",
+            "normalMatrix",
+            "ka",
+            "kd",
+            "ks",
+            "shininess",
+            "isSkybox",
+            "dequantize",
+        ],
+        "formats": [
+            ("<f4", (4, 4)),
+            ("<f4", (4, 4)),
+            ("<f4", (3, 4)),
+            "<f4",
+            "<f4",
+            "<f4",
+            "<f4",
+            "<i4",
+            ("<f4", (4, 4)),
+        ],
+        "offsets": [0, 64, 128, 176, 180, 184, 188, 192, 208],
+        "itemsize": 272,
+    }
+)
+
+
+_GLM_MATRICES = (glm.mat3, glm.mat4)
+
+
+def _to_array(value):
+    """
+    转换为 float32 数组；glm 矩阵（或矩阵列表）转换为按列存放的形式
+
+    np.asarray(glm 矩阵) 的每一行是矩阵的一行，转置后每一行才是一列
+    """
+    if isinstance(value, _GLM_MATRICES):
+        return np.asarray(value, dtype=np.float32).T
+    if isinstance(value, (list, tuple)) and isinstance(value[0], _GLM_MATRICES):
+        return np.stack([_to_array(m) for m in value])
+    return np.asarray(value, dtype=np.float32)
+
+
+class UniformBuffer:
+    """
+    std140 uniform buffer
+
+    数据保存在一个 NumPy 结构体中，先用 buffer["名称"] = 值 填写各成员，
+    再调用 upload 用一次 glBufferSubData 整体上传；内容与上次上传相同时跳过。
+    缓冲绑定到固定的绑定点，着色器中 layout(binding = N) 的 block 直接读取，
+    所有程序共享同一份数据。
+    """
+
+    def __init__(self, dtype, binding):
+        self.dtype = dtype
+        self.binding = binding
+        self.data = np.zeros(1, dtype=dtype)
+        self._uploaded = None
+
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferData(GL_UNIFORM_BUFFER, dtype.itemsize, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, binding, self.buffer)
+
+    def __setitem__(self, name, value):
+        """填写一个成员，value 可以是 glm 向量/矩阵、glm 矩阵列表、数组或数值"""
+        field = self.data[name][0]
+        if np.ndim(field) == 0:
+            self.data[name] = value
+            return
+        value = _to_array(value)
+        if field.ndim >= 2:
+            # mat3 只填每个 vec4 槽的前三个分量，矩阵数组只填前 n 个
+            field[tuple(slice(0, n) for n in value.shape)] = value
+        else:
+            field[:] = value
+
+    def __getitem__(self, name):
+        return self.data[name][0]
+
+    def upload(self):
+        """把结构体整体上传到 GPU"""
+        raw = self.data.tobytes()
+        if raw == self._uploaded:
+            return
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, len(raw), raw)
+        self._uploaded = raw
@@ -1,10 +1,15 @@
 import math
+import time
 
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 
 from framework.renderer import Renderer
 
+FRAME_INTERVAL_MS = 16  # 画面变化时的计时间隔
+IDLE_POLL_MS = 250  # 画面静止时的轮询间隔
+MAX_DELTA_TIME = 0.1  # 单帧时间上限，避免窗口卡顿后球或相机一下跳得很远
+
 
 class Application:
     def __init__(self):
@@ -16,6 +21,11 @@ class Application:
         self.is_mouse_down = False
         self.last_mouse_pos = [0, 0]
 
+        # glutTimerFunc 无法取消，每次重新开始计时都换一个编号，旧编号的计时器到期后直接丢弃
+        self._timer_generation = 0
+        self._timer_fast = False
+        self._last_time = 0.0
+
     def initialize(self):
         glutInit(sys.argv)
         glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH | GLUT_MULTISAMPLE)
@@ -36,6 +46,8 @@ class Application:
         print("  P: Phong Shading")
         print("  B: 开关Bump Mapping")
         print("  S: 开关阴影")
+        print("  K: 切换 PCF 软阴影采样方式")
+        print("  C: 切换阴影级联数（1 / 2 / 4）")
         print("  +/-: 拉近/拉远相机（观察纹理走样）")
         print("  H: 显示帮助")
         print("  Q/ESC: 退出")
@@ -55,17 +67,34 @@ class Application:
         glutMouseFunc(self._mouse_button)
         glutMotionFunc(self._mouse_move)
 
-        glutTimerFunc(16, self.timer, 0)
+        self._wake()
 
     def display(self):
         self.renderer.render()
         glutSwapBuffers()
+        self.renderer.needs_redraw = False
 
     def reshape(self, width, height):
         self.width = width
         self.height = height
         glViewport(0, 0, width, height)
         self.renderer.camera.set_aspect(width / height)
+        self._request_redraw()
+
+    def _request_redraw(self):
+        """状态改变后请求重绘，空闲时恢复逐帧计时"""
+        self.renderer.needs_redraw = True
+        glutPostRedisplay()
+        self._wake()
+
+    def _wake(self):
+        """从空闲轮询切换到逐帧计时，重新开始计算帧间隔"""
+        if self._timer_fast:
+            return
+        self._timer_fast = True
+        self._timer_generation += 1
+        self._last_time = time.perf_counter()
+        glutTimerFunc(FRAME_INTERVAL_MS, self.timer, self._timer_generation)
 
     def special_keyboard(self, key, x, y):
         """处理特殊键（方向键等）"""
@@ -82,7 +111,7 @@ class Application:
                 self.renderer.camera.position.z = 15.0
             print(f"相机距离: {self.renderer.camera.position.z:.1f}")
 
-        glutPostRedisplay()
+        self._request_redraw()
 
     def _special_keyboard_down(self, key, x, y):
         # 委托给之前的 special_keyboard 函数处理
@@ -97,7 +126,7 @@ class Application:
         else:
             print(f"未处理的按键: {key}")
 
-        glutPostRedisplay()
+        self._request_redraw()
 
     def _special_keyboard_up(self, key, x, y):
         if key == 112:
@@ -106,7 +135,7 @@ class Application:
         else:
             print(f"未处理的按键: {key}")
 
-        glutPostRedisplay()
+        self._request_redraw()
 
     def keyboard(self, key, x, y):
         if key in b"qQ\x1b":
@@ -125,6 +154,10 @@ class Application:
             self.renderer.toggle_bump()
         elif key in b"iI":
             self.renderer.toggle_shadow()
+        elif key in b"kK":
+            self.renderer.cycle_pcf_mode()
+        elif key in b"cC":
+            self.renderer.cycle_shadow_cascades()
         elif key in b"+=" or key == GLUT_KEY_UP:
             # 拉近相机
             self.renderer.camera.position.z -= 0.5
@@ -140,11 +173,11 @@ class Application:
         elif key in b"hH":
             self.print_help()
 
-        glutPostRedisplay()
+        self._request_redraw()
 
     def _keyboard_down(self, key, x, y):
         # 委托给之前的 keyboard 函数处理
-        if key in b"qQ\x1b1234567fFgGpPbBiI+=-_hH":
+        if key in b"qQ\x1b1234567fFgGpPbBiIkKcC+=-_hH":
             self.keyboard(key, x, y)
             return
 
@@ -167,10 +200,10 @@ class Application:
         else:
             print(f"未处理的按键: {key}")
 
-        glutPostRedisplay()
+        self._request_redraw()
 
     def _keyboard_up(self, key, x, y):
-        if key in b"qQ\x1b1234567fFgGpPbBiI+=-_hH":
+        if key in b"qQ\x1b1234567fFgGpPbBiIkKcC+=-_hH":
             return
 
         if key in b"wW":
@@ -191,7 +224,7 @@ class Application:
         else:
             print(f"未处理的按键: {key}")
 
-        glutPostRedisplay()
+        self._request_redraw()
 
     def _mouse_button(self, button, state, x, y):
         if state == GLUT_DOWN:
@@ -209,11 +242,24 @@ class Application:
                 self.renderer.camera.angle_change(
                     math.radians(dx) / 2, -math.radians(dy) / 2
                 )
+                self._request_redraw()
 
-    def timer(self, value):
-        self.renderer.update(0.016)
-        glutPostRedisplay()
-        glutTimerFunc(16, self.timer, 0)
+    def timer(self, generation):
+        if generation != self._timer_generation:
+            return  # 已被 _wake 取代的计时器
+
+        now = time.perf_counter()
+        delta_time = min(now - self._last_time, MAX_DELTA_TIME)
+        self._last_time = now
+
+        self.renderer.update(delta_time)
+        if self.renderer.needs_redraw:
+            glutPostRedisplay()
+
+        # 球暂停且相机不动时画面不会变化，降为低频轮询，不再重绘
+        self._timer_fast = self.renderer.is_animating()
+        interval = FRAME_INTERVAL_MS if self._timer_fast else IDLE_POLL_MS
+        glutTimerFunc(interval, self.timer, generation)
 
     def print_help(self):
         print("\n" + "=" * 70)
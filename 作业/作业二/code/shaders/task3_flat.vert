@@ -12,18 +12,29 @@
  * - 纹理坐标直接传递即可
  */
 
-layout (location = 0) in vec4 position;
+layout (location = 0) in vec4 aPosition;
 layout (location = 1) in vec2 texcoord;
 layout (location = 2) in vec3 normal;
 
-uniform mat4 MVP;
-uniform mat4 M;
+// 每个物体的变换与材料属性（std140，绑定点 1，每次绘制上传一次）
+layout (std140, binding = 1) uniform ObjectData {
+    mat4 MVP;
+    mat4 M;
+    mat3 normalMatrix;
+    float ka;
+    float kd;
+    float ks;
+    float shininess;
+    int isSkybox;
+    mat4 dequantize; // 把量化存放的顶点位置还原到模型空间
+};
 
 out vec2 vTexCoord;
 out vec3 vNormal;
 out vec3 vWorldPos;
 
 void main() {
+    vec4 position = dequantize * aPosition;
 
     gl_Position = MVP * position;
     vTexCoord = texcoord;
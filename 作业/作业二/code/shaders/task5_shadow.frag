@@ -18,6 +18,14 @@
  * - 计算在阴影中的比例
  * - 使阴影边缘更加柔和
  *
+ * 阴影贴图开启了深度比较（sampler2DArrayShadow + GL_LINEAR），每次采样由硬件完成
+ * 相邻 2x2 个纹素的比较并双线性插值，返回的是不在阴影中的比例。
+ * 阴影贴图的每一层是一级级联，按片元沿视线方向的距离选择；只有一级时即整个场景。
+ * pcfMode 选择采样方式：
+ * - 0：只采样一次，即硬件 2x2 PCF
+ * - 1：Poisson 圆盘 16 次采样（默认）
+ * - 2：Poisson 圆盘按像素随机旋转，把条带状的走样换成逐像素的噪声
+ *
  * 提示：
  * - 光源空间坐标已通过vLightSpacePos传入
  * - 需要进行透视除法：pos.xyz / pos.w
@@ -31,25 +39,53 @@ in vec3 vWorldPos;      // 顶点的世界坐标
 in vec4 vLightSpacePos; // 顶点在光源系下的位置
 
 uniform sampler2D texDiffuse; // 材质贴图
-uniform sampler2D shadowMap;  // 阴影贴图
-uniform vec3 lightPos;        // 光源位置
-uniform vec3 viewPos;         // 相机位置
-uniform vec3 lightColor;      // 光源颜色
-uniform float lightIntensity; // 光源强度
+uniform sampler2DArrayShadow shadowMap; // 阴影贴图（深度比较，每层一级级联）
+uniform int pcfMode;                     // PCF 采样方式，见开头的说明
 
-out vec4 FragColor;
+// 每帧共享的相机与光源数据（std140，绑定点 0，每帧上传一次）
+layout (std140, binding = 0) uniform FrameData {
+    mat4 lightSpaceMatrix; // 光源空间矩阵
+    vec3 lightPos;         // 光源位置
+    float lightIntensity;  // 光源强度
+    vec3 viewPos;          // 相机位置
+    vec3 lightColor;       // 光源颜色
+    int cascadeCount;              // 阴影级联数
+    mat4 cascadeMatrices[4];       // 每一级的光源空间矩阵
+    vec4 cascadeSplits;            // 每一级覆盖到的视线方向距离
+    vec4 cascadeScales[4];         // 每一级的 (1 / 宽度, 1 / 深度范围)
+    vec3 viewDir;                  // 相机视线方向
+};
 
-// 材料属性
-uniform float ka;
-uniform float kd;
-uniform float ks;
-uniform float shininess;
+// 每个物体的变换与材料属性（std140，绑定点 1，每次绘制上传一次）
+layout (std140, binding = 1) uniform ObjectData {
+    mat4 MVP;
+    mat4 M;
+    mat3 normalMatrix;
+    float ka;
+    float kd;
+    float ks;
+    float shininess;
+    int isSkybox;
+    mat4 dequantize; // 把量化存放的顶点位置还原到模型空间
+};
+
+out vec4 FragColor;
 
-float sampleIfShadow(vec4);
-float PCF(vec4);
+float sampleIfShadow(vec3, float, vec2);
+float PCF(vec4, int);
 
 void main() {
-    float shadow = PCF(vLightSpacePos);
+    // 选择片元所在的级联，超出最后一级的范围时不计算阴影
+    float viewDepth = dot(vWorldPos - viewPos, viewDir);
+    int cascade = 0;
+    while (cascade < cascadeCount && viewDepth > cascadeSplits[cascade]) {
+        cascade++;
+    }
+    float shadow = 0.0;
+    if (cascade < cascadeCount) {
+        vec4 lightSpacePos = cascade == 0 ? vLightSpacePos : cascadeMatrices[cascade] * vec4(vWorldPos, 1.0);
+        shadow = PCF(lightSpacePos, cascade);
+    }
 
     // 法线 N
     vec3 N = normalize(vNormal);
@@ -72,28 +108,51 @@ void main() {
     1);
 }
 
-// 根据阴影贴图判断是否在阴影中。采样一次
-float sampleIfShadow(vec4 pos) {
-    vec3 shadowCoord = pos.xyz / pos.w * 0.5 + 0.5; // 透视除法 & 从 [-1,1] 变换到 [0,1]
-    float closestDepth = texture(shadowMap, shadowCoord .xy).r; // 从阴影贴图中采样深度（最小的深度）
-    float currentDepth = shadowCoord .z;                        // 片元在光源空间下的深度
-    return currentDepth - 0.02 > closestDepth ? 1.0 : 0.0;
+// 采样半径与深度偏移以世界坐标为单位，按每一级光源投影的大小换算，
+// 等于原来在 20 x 20 x 19 的固定投影下的 0.01（纹理坐标）与 0.02（深度）
+const float PCF_RADIUS = 0.2;
+const float SHADOW_BIAS = 0.38;
+
+const vec2 POISSON_DISK[16] = vec2[](
+    vec2(-0.94201624, -0.39906216), vec2( 0.94558609, -0.76890725),
+    vec2(-0.09418410, -0.92938870), vec2( 0.34495938,  0.29387760),
+    vec2(-0.91588581,  0.45771432), vec2(-0.81544232, -0.87912464),
+    vec2(-0.38277543,  0.27676845), vec2( 0.97484398,  0.75648379),
+    vec2( 0.44323325, -0.97511554), vec2( 0.53742981, -0.47373420),
+    vec2(-0.26496911, -0.41893023), vec2( 0.79197514,  0.19090188),
+    vec2(-0.24188840,  0.99706507), vec2(-0.81409955,  0.91437590),
+    vec2( 0.19984126,  0.78641367), vec2( 0.14383161, -0.14100790)
+);
+
+// 根据阴影贴图判断是否在阴影中。采样一次，返回在阴影中的比例
+float sampleIfShadow(vec3 shadowCoord, float layer, vec2 offset) {
+    // 硬件比较 shadowCoord.z <= 贴图深度，返回 2x2 纹素中通过比较（被照亮）的比例
+    return 1.0 - texture(shadowMap, vec4(shadowCoord.xy + offset, layer, shadowCoord.z));
 }
 
-// 计算PCF软阴影。采样多次
-float PCF(vec4 pos) {
-    float shadow = 0.0;
-    int nSamples = 0;
+// 计算PCF软阴影。采样次数由 pcfMode 决定
+float PCF(vec4 pos, int cascade) {
+    vec3 shadowCoord = pos.xyz / pos.w * 0.5 + 0.5; // 透视除法 & 从 [-1,1] 变换到 [0,1]
+    vec2 scale = cascadeScales[cascade].xy;
+    shadowCoord.z -= SHADOW_BIAS * scale.y;
+    float layer = float(cascade);
 
-    float radius = 0.02;
-    float step = radius / 10.0;
+    if (pcfMode == 0) {
+        return sampleIfShadow(shadowCoord, layer, vec2(0.0));
+    }
 
-    for (float i = -radius; i <= radius; i += step) {
-        for (float j = -radius; j <= radius; j += step) {
-            shadow += sampleIfShadow(pos + vec4(i, j, 0, 0));
-            nSamples++;
-        }
+    mat2 rotation = mat2(1.0);
+    if (pcfMode == 2) {
+        // 由屏幕坐标生成每个像素不同的旋转角
+        float angle = 6.2831853 * fract(sin(dot(gl_FragCoord.xy, vec2(12.9898, 78.233))) * 43758.5453);
+        float c = cos(angle);
+        float s = sin(angle);
+        rotation = mat2(c, s, -s, c);
     }
 
-    return shadow / nSamples;
+    float shadow = 0.0;
+    for (int i = 0; i < 16; i++) {
+        shadow += sampleIfShadow(shadowCoord, layer, rotation * POISSON_DISK[i] * PCF_RADIUS * scale.x);
+    }
+    return shadow / 16.0;
 }
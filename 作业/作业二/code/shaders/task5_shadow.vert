@@ -4,13 +4,36 @@
  * 任务5：阴影顶点着色器（框架提供，学生无需修改）
  */
 
-layout (location = 0) in vec4 position;
+layout (location = 0) in vec4 aPosition;
 layout (location = 1) in vec2 texcoord;
 layout (location = 2) in vec3 normal;
 
-uniform mat4 MVP;
-uniform mat4 M;
-uniform mat4 lightSpaceMatrix;
+// 每帧共享的相机与光源数据（std140，绑定点 0，每帧上传一次）
+layout (std140, binding = 0) uniform FrameData {
+    mat4 lightSpaceMatrix; // 光源空间矩阵
+    vec3 lightPos;         // 光源位置
+    float lightIntensity;  // 光源强度
+    vec3 viewPos;          // 相机位置
+    vec3 lightColor;       // 光源颜色
+    int cascadeCount;              // 阴影级联数
+    mat4 cascadeMatrices[4];       // 每一级的光源空间矩阵
+    vec4 cascadeSplits;            // 每一级覆盖到的视线方向距离
+    vec4 cascadeScales[4];         // 每一级的 (1 / 宽度, 1 / 深度范围)
+    vec3 viewDir;                  // 相机视线方向
+};
+
+// 每个物体的变换与材料属性（std140，绑定点 1，每次绘制上传一次）
+layout (std140, binding = 1) uniform ObjectData {
+    mat4 MVP;
+    mat4 M;
+    mat3 normalMatrix;
+    float ka;
+    float kd;
+    float ks;
+    float shininess;
+    int isSkybox;
+    mat4 dequantize; // 把量化存放的顶点位置还原到模型空间
+};
 
 out vec2 vTexCoord;
 out vec3 vNormal;
@@ -18,6 +41,7 @@ out vec3 vWorldPos;
 out vec4 vLightSpacePos;
 
 void main() {
+    vec4 position = dequantize * aPosition;
     gl_Position = MVP * position;
     vTexCoord = texcoord;
     vNormal = mat3(M) * normal;
@@ -5,19 +5,35 @@ in vec3 vNormal;        // 顶点处的法向量
 in vec3 vWorldPos;      // 顶点的世界坐标
 
 uniform sampler2D texDiffuse; // 材质贴图
-uniform vec3 lightPos;        // 光源位置
-uniform vec3 viewPos;         // 相机位置
-uniform vec3 lightColor;      // 光源颜色
-uniform float lightIntensity; // 光源强度
 
-out vec4 FragColor;
+// 每帧共享的相机与光源数据（std140，绑定点 0，每帧上传一次）
+layout (std140, binding = 0) uniform FrameData {
+    mat4 lightSpaceMatrix; // 光源空间矩阵
+    vec3 lightPos;         // 光源位置
+    float lightIntensity;  // 光源强度
+    vec3 viewPos;          // 相机位置
+    vec3 lightColor;       // 光源颜色
+    int cascadeCount;              // 阴影级联数
+    mat4 cascadeMatrices[4];       // 每一级的光源空间矩阵
+    vec4 cascadeSplits;            // 每一级覆盖到的视线方向距离
+    vec4 cascadeScales[4];         // 每一级的 (1 / 宽度, 1 / 深度范围)
+    vec3 viewDir;                  // 相机视线方向
+};
+
+// 每个物体的变换与材料属性（std140，绑定点 1，每次绘制上传一次）
+layout (std140, binding = 1) uniform ObjectData {
+    mat4 MVP;
+    mat4 M;
+    mat3 normalMatrix;
+    float ka;
+    float kd;
+    float ks;
+    float shininess;
+    int isSkybox;
+    mat4 dequantize; // 把量化存放的顶点位置还原到模型空间
+};
 
-// 材料属性
-uniform float ka;
-uniform float kd;
-uniform float ks;
-uniform float shininess;
-uniform int isSkybox;
+out vec4 FragColor;
 
 // 将3D方向向量转换为2D球面映射纹理坐标
 vec2 directionToSphericalUV(vec3 dir) {